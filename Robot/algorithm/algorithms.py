@@ -1,6 +1,12 @@
 """Module containing pathfinding algorithms."""
 import logging
 import heapq
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from algorithm.sweep import Sweep
+from algorithm.path import as_path
 
 logger = logging.getLogger(__name__)
 
@@ -58,3 +64,669 @@ class Algorithms:
             cur = came_from[cur]
             path.append(cur)
         return path[::-1]
+
+    def label_components(self, grid):
+        """
+        Label the 4-connected free regions of the grid.
+
+        Free runs of each row are merged with the overlapping runs of the
+        next row in a union-find, so the work scales with the number of
+        runs rather than the number of cells.
+
+        Args:
+            grid: 2D array representing the grid
+
+        Returns:
+            Tuple of (labels, count) where labels holds the component id of
+            every free cell (numbered in row-major order of first appearance)
+            and -1 for blocked cells
+        """
+        h, w = grid.shape
+        labels = np.full(h * w, -1, dtype=np.int32)
+        lines, firsts, lasts = Sweep.free_runs(grid)
+        if not lines.size:
+            return labels.reshape(h, w), 0
+
+        # Run b on row r + 1 touches every run on row r whose span overlaps
+        # it; those runs are contiguous in row-major order.
+        stride = w + 1
+        first_keys = lines * stride + firsts
+        last_keys = lines * stride + lasts
+        lo = np.searchsorted(last_keys, (lines - 1) * stride + firsts, side="left")
+        hi = np.searchsorted(first_keys, (lines - 1) * stride + lasts, side="right")
+        counts = np.maximum(hi - lo, 0)
+        below = np.repeat(np.arange(lines.size), counts)
+        above = np.repeat(lo, counts) + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+
+        parent = list(range(lines.size))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for a, b in zip(above.tolist(), below.tolist()):
+            ra, rb = find(a), find(b)
+            if ra != rb:
+                parent[max(ra, rb)] = min(ra, rb)
+
+        roots = np.array([find(i) for i in range(lines.size)])
+        _, run_labels = np.unique(roots, return_inverse=True)
+
+        # Free cells in row-major order are exactly the runs laid end to end
+        lengths = lasts - firsts + 1
+        labels[np.flatnonzero(grid.ravel() == 0)] = np.repeat(run_labels, lengths)
+        return labels.reshape(h, w), int(run_labels.max()) + 1
+
+
+class GridSearch:
+    """
+    A* engine bound to one occupancy grid, using flat integer cell indices.
+
+    The free-cell neighbour table and the g/parent arrays are allocated once
+    per grid and reused by every search. Each search stamps the cells it
+    touches with its own id, so nothing has to be cleared between calls.
+    Connected components are labelled up front so searches between
+    different free regions fail immediately.
+    """
+
+    # Same expansion order as Algorithms.astar: down, up, right, left
+    MOVES = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+    def __init__(self, grid):
+        h, w = grid.shape
+        self.shape = (h, w)
+        self.width = w
+        self.expansions = 0
+        self.unreachable = 0
+        self.labels, self.components = Algorithms().label_components(grid)
+
+        self._neighbors = self._neighbor_table(grid)
+        self._g = np.zeros(h * w, dtype=np.int32)
+        self._parent = np.full(h * w, -1, dtype=np.int32)
+        self._stamp = np.zeros(h * w, dtype=np.int32)
+        self._search_id = 0
+
+    def _neighbor_table(self, grid):
+        """Return an (h * w * 4) table of free neighbour indices, -1 where blocked."""
+        h, w = grid.shape
+        idx = np.arange(h * w, dtype=np.int32).reshape(h, w)
+        free = grid == 0
+        table = np.full((h, w, 4), -1, dtype=np.int32)
+
+        for k, (dr, dc) in enumerate(self.MOVES):
+            dst_r = slice(max(dr, 0), h + min(dr, 0))
+            dst_c = slice(max(dc, 0), w + min(dc, 0))
+            src_r = slice(max(-dr, 0), h + min(-dr, 0))
+            src_c = slice(max(-dc, 0), w + min(-dc, 0))
+            table[src_r, src_c, k] = np.where(free[dst_r, dst_c], idx[dst_r, dst_c], -1)
+
+        return table.ravel()
+
+    def search(self, start, goal):
+        """
+        A* search between two cells of the bound grid.
+
+        Args:
+            start: Starting position tuple
+            goal: Goal position tuple
+
+        Returns:
+            (N, 2) path array from start to goal, empty if no path found
+        """
+        w = self.width
+        source = start[0] * w + start[1]
+        target = goal[0] * w + goal[1]
+        goal_r, goal_c = goal
+
+        start_label, goal_label = self.labels[start], self.labels[goal]
+        if start_label >= 0 and goal_label >= 0 and start_label != goal_label:
+            self.unreachable += 1
+            return as_path([], self.shape)
+
+        self._search_id += 1
+        search_id = self._search_id
+        # Scalar access through memoryviews yields plain Python ints
+        neighbors = memoryview(self._neighbors)
+        g = memoryview(self._g)
+        parent = memoryview(self._parent)
+        stamp = memoryview(self._stamp)
+
+        stamp[source] = search_id
+        g[source] = 0
+        parent[source] = -1
+        pq = [(0, source)]
+        expanded = 0
+
+        while pq:
+            f, cur = heapq.heappop(pq)
+
+            if cur == target:
+                self.expansions += expanded
+                return self._reconstruct(parent, cur)
+
+            cost = g[cur]
+            r, c = divmod(cur, w)
+            if f > cost + abs(r - goal_r) + abs(c - goal_c):
+                continue  # Stale queue entry
+            expanded += 1
+
+            cost += 1
+            base = cur * 4
+            for n in neighbors[base:base + 4]:
+                if n < 0:
+                    continue
+                if stamp[n] != search_id or cost < g[n]:
+                    stamp[n] = search_id
+                    g[n] = cost
+                    parent[n] = cur
+                    nr, nc = divmod(n, w)
+                    heapq.heappush(pq, (cost + abs(nr - goal_r) + abs(nc - goal_c), n))
+
+        self.expansions += expanded
+        return as_path([], self.shape)
+
+    def _reconstruct(self, parent, cur):
+        """Reconstruct the path array from the parent array."""
+        cells = []
+        while cur != -1:
+            cells.append(cur)
+            cur = parent[cur]
+        return as_path(np.stack(np.divmod(np.array(cells[::-1]), self.width), axis=1), self.shape)
+
+
+class JumpPointSearch:
+    """
+    Jump Point Search over one 4-connected, uniform-cost occupancy grid.
+
+    Straight runs of symmetric moves are skipped by jumping until a forced
+    neighbour, the goal, or (when moving vertically) a horizontal jump
+    point is found, so only the jump points enter the open list. The
+    goal-independent jump stops are precomputed per grid with NumPy, so a
+    jump is a table lookup rather than a cell-by-cell walk. Returned paths
+    are expanded back to every cell, like GridSearch.search.
+    """
+
+    def __init__(self, grid):
+        h, w = grid.shape
+        self.shape = (h, w)
+        self.width = w
+        self.expansions = 0
+        self.unreachable = 0
+        self.labels, self.components = Algorithms().label_components(grid)
+
+        # A blocked border removes every bounds check from the jump logic
+        self._stride = w + 2
+        padded = np.zeros((h + 2, w + 2), dtype=bool)
+        padded[1:-1, 1:-1] = grid == 0
+        self._free = padded.ravel().astype(np.uint8)
+        self._build_jump_tables(padded)
+
+        size = self._free.size
+        self._g = np.zeros(size, dtype=np.int32)
+        self._parent = np.full(size, -1, dtype=np.int32)
+        self._stamp = np.zeros(size, dtype=np.int32)
+        self._search_id = 0
+
+    def _build_jump_tables(self, free):
+        """
+        Precompute, for every cell and direction, where a jump stops.
+
+        ``_stop[step][p]`` is the first jump point at or after p when moving
+        by step (or -1 if the run ends first) and ``_end[step][p]`` is the
+        last free cell of that run.
+        """
+        stride = self._stride
+        rows, cols = np.indices(free.shape)
+        flat = rows * stride + cols
+
+        def shifted(a, dr, dc):
+            # Value of the neighbour at (r + dr, c + dc), False off the grid
+            out = np.zeros_like(a)
+            h, w = a.shape
+            out[max(-dr, 0):h - max(dr, 0), max(-dc, 0):w - max(dc, 0)] = \
+                a[max(dr, 0):h - max(-dr, 0), max(dc, 0):w - max(-dc, 0)]
+            return out
+
+        def scan(forced, axis, forward):
+            # Nearest forced cell and nearest blocked cell along the axis
+            pos = rows if axis == 0 else cols
+            limit = free.shape[axis]
+            if forward:
+                stop_at = np.where(forced | ~free, pos, limit)
+                block_at = np.where(~free, pos, limit)
+                acc = lambda a: np.flip(np.minimum.accumulate(np.flip(a, axis), axis=axis), axis)
+            else:
+                stop_at = np.where(forced | ~free, pos, -1)
+                block_at = np.where(~free, pos, -1)
+                acc = lambda a: np.maximum.accumulate(a, axis=axis)
+            stop_pos, block_pos = acc(stop_at), acc(block_at)
+            end_pos = block_pos - 1 if forward else block_pos + 1
+            to_flat = (lambda p: p * stride + cols) if axis == 0 else (lambda p: rows * stride + p)
+
+            stop = np.where(free & (stop_pos != block_pos), to_flat(stop_pos), -1)
+            end = np.where(free, to_flat(np.clip(end_pos, 0, limit - 1)), -1)
+            return stop.ravel().astype(np.int32), end.ravel().astype(np.int32)
+
+        self._stop, self._end = {}, {}
+        for dc in (1, -1):
+            # Moving horizontally: a cell above or below opens up behind us
+            forced = free & ((shifted(free, -1, 0) & ~shifted(free, -1, -dc)) |
+                             (shifted(free, 1, 0) & ~shifted(free, 1, -dc)))
+            self._stop[dc], self._end[dc] = scan(forced, axis=1, forward=dc > 0)
+
+        # Moving vertically also stops where a horizontal jump would succeed
+        horizontal_jump = (np.roll(self._stop[1], -1) >= 0) | (np.roll(self._stop[-1], 1) >= 0)
+        horizontal_jump = horizontal_jump.reshape(free.shape)
+        for dr in (1, -1):
+            forced = free & ((shifted(free, 0, -1) & ~shifted(free, -dr, -1)) |
+                             (shifted(free, 0, 1) & ~shifted(free, -dr, 1)) |
+                             horizontal_jump)
+            step = dr * stride
+            self._stop[step], self._end[step] = scan(forced, axis=0, forward=dr > 0)
+
+    def search(self, start, goal):
+        """
+        Jump Point Search between two cells of the bound grid.
+
+        Args:
+            start: Starting position tuple
+            goal: Goal position tuple
+
+        Returns:
+            (N, 2) path array from start to goal, empty if no path found
+        """
+        start_label, goal_label = self.labels[start], self.labels[goal]
+        if start_label >= 0 and goal_label >= 0 and start_label != goal_label:
+            self.unreachable += 1
+            return as_path([], self.shape)
+
+        stride = self._stride
+        source = (start[0] + 1) * stride + start[1] + 1
+        target = (goal[0] + 1) * stride + goal[1] + 1
+        if not self._free[target]:
+            return as_path([start] if source == target else [], self.shape)
+
+        self._search_id += 1
+        search_id = self._search_id
+        free = memoryview(self._free)
+        g = memoryview(self._g)
+        parent = memoryview(self._parent)
+        stamp = memoryview(self._stamp)
+        goal_r, goal_c = divmod(target, stride)
+
+        stamp[source] = search_id
+        g[source] = 0
+        parent[source] = -1
+        pq = [(0, source)]
+        expanded = 0
+
+        while pq:
+            f, cur = heapq.heappop(pq)
+
+            if cur == target:
+                self.expansions += expanded
+                return self._reconstruct(parent, cur)
+
+            cost = g[cur]
+            r, c = divmod(cur, stride)
+            if f > cost + abs(r - goal_r) + abs(c - goal_c):
+                continue  # Stale queue entry
+            expanded += 1
+
+            for step in self._directions(free, parent[cur], cur):
+                jump = self._jump(cur + step, step, target)
+                if jump < 0:
+                    continue
+                jr, jc = divmod(jump, stride)
+                new_cost = cost + abs(jr - r) + abs(jc - c)
+                if stamp[jump] != search_id or new_cost < g[jump]:
+                    stamp[jump] = search_id
+                    g[jump] = new_cost
+                    parent[jump] = cur
+                    heapq.heappush(pq, (new_cost + abs(jr - goal_r) + abs(jc - goal_c), jump))
+
+        self.expansions += expanded
+        return as_path([], self.shape)
+
+    def _directions(self, free, prev, cur):
+        """Return the pruned set of move offsets to explore from cur."""
+        stride = self._stride
+        if prev < 0:
+            steps = (stride, -stride, 1, -1)
+        elif abs(cur - prev) < stride:
+            # Arrived horizontally: keep going, or turn up or down
+            dc = 1 if cur > prev else -1
+            steps = (stride, -stride, dc)
+        else:
+            # Arrived vertically: keep going, or turn left or right
+            dr = stride if cur > prev else -stride
+            steps = (1, -1, dr)
+        return [step for step in steps if free[cur + step]]
+
+    def _jump(self, cur, step, target):
+        """Return the jump point reached from cur moving by step, or -1."""
+        stop = int(self._stop[step][cur])
+        end = int(self._end[step][cur])
+        if end < 0:
+            return -1
+        limit = stop if stop >= 0 else end
+        stride = self._stride
+
+        # The goal itself, or the goal's row when moving vertically, can
+        # stop the jump before the precomputed stop.
+        if abs(step) == 1:
+            if target // stride == cur // stride and 0 <= (target - cur) * step <= (limit - cur) * step:
+                return target
+            return stop
+
+        row_cell = cur + (target // stride - cur // stride) * stride
+        if 0 <= (row_cell - cur) // step <= (limit - cur) // step:
+            if row_cell == target or self._jump(row_cell + 1, 1, target) == target or \
+                    self._jump(row_cell - 1, -1, target) == target:
+                return row_cell
+        return stop
+
+    def _reconstruct(self, parent, cur):
+        """Expand the chain of jump points back into every visited cell."""
+        stride = self._stride
+        jump_points = []
+        while cur != -1:
+            jump_points.append(cur)
+            cur = parent[cur]
+        jump_points.reverse()
+
+        cells = [jump_points[0]]
+        for a, b in zip(jump_points, jump_points[1:]):
+            step = (stride if abs(b - a) >= stride else 1) * (1 if b > a else -1)
+            cells.extend(range(a + step, b + step, step))
+        return as_path(np.stack(np.divmod(np.array(cells), stride), axis=1) - 1, self.shape)
+
+
+def grid_fingerprint(grid):
+    """Return a content hash identifying an occupancy grid."""
+    digest = hashlib.blake2b(np.ascontiguousarray(grid, dtype=np.uint8).tobytes(), digest_size=16)
+    digest.update(repr(grid.shape).encode())
+    return digest.hexdigest()
+
+
+class ConnectorCache:
+    """
+    LRU cache of connector paths keyed by grid fingerprint and endpoints.
+
+    Entries are evicted least recently used first once their size exceeds
+    max_bytes. Each travel direction is cached on its own, so a hit returns
+    exactly the path a fresh search from start to goal would.
+    """
+
+    # Rough footprint of an entry besides its path array (key, array header, LRU links)
+    ENTRY_OVERHEAD = 300
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, fingerprint, start, goal):
+        """Return the cached path from start to goal, or None."""
+        key = self._key(fingerprint, start, goal)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return entry[0]
+
+    def put(self, fingerprint, start, goal, path):
+        """Store the path from start to goal, evicting old entries as needed."""
+        key = self._key(fingerprint, start, goal)
+        stored = np.array(path)
+        stored.flags.writeable = False
+        size = self.ENTRY_OVERHEAD + stored.nbytes
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous[1]
+            self._entries[key] = (stored, size)
+            self.current_bytes += size
+            self._evict()
+
+    def record(self, hits, misses):
+        """Count lookups served by another process's cache, e.g. a strategy worker's."""
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def lookups(self):
+        """Return the (hits, misses) counted so far."""
+        with self._lock:
+            return self.hits, self.misses
+
+    def resize(self, max_bytes):
+        """Change the memory budget, evicting entries that no longer fit."""
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def clear(self):
+        """Drop every entry and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        """Return hit/miss counters and memory usage for monitoring."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+            }
+
+    def _evict(self):
+        while self.current_bytes > self.max_bytes and self._entries:
+            _, (_, size) = self._entries.popitem(last=False)
+            self.current_bytes -= size
+            self.evictions += 1
+
+    @staticmethod
+    def _key(fingerprint, start, goal):
+        return fingerprint, tuple(map(int, start)), tuple(map(int, goal))
+
+
+class CachedSearch:
+    """Connector search engine wrapper that consults a ConnectorCache first."""
+
+    def __init__(self, engine, cache, fingerprint):
+        self.engine = engine
+        self.cache = cache
+        self.fingerprint = fingerprint
+        self.labels, self.components = engine.labels, engine.components
+
+    def search(self, start, goal):
+        """Return the cached connector, searching and caching it on a miss."""
+        path = self.cache.get(self.fingerprint, start, goal)
+        if path is None:
+            path = self.engine.search(start, goal)
+            self.cache.put(self.fingerprint, start, goal, path)
+        return path
+
+    @property
+    def expansions(self):
+        return self.engine.expansions
+
+    @property
+    def unreachable(self):
+        return self.engine.unreachable
+
+
+class CorridorSearch:
+    """
+    Connector search confined to a corridor along a coarse-resolution path.
+
+    The coarse path is walked from where it visits the start cell to where
+    it visits the goal cell. Fine cells within margin coarse cells of that
+    stretch form the corridor, and the connector is searched in its window
+    only. A stretch that winds much further than the two cells are apart is
+    replaced by a connector searched on the coarse grid. Cells the coarse
+    path never visits and corridors without a connector fall back to the
+    wrapped full-grid search.
+
+    Search engines are built per corridor window and the most recently used
+    ones are kept, since neighbouring connectors often share a corridor.
+    """
+
+    # Corridor window engines kept for reuse
+    WINDOW_ENGINES = 64
+
+    def __init__(self, search, grid, coarse_path, coarse_grid, scale, margin=1, detour=4, engine=GridSearch):
+        """
+        Args:
+            search: Full-grid search engine used as fallback
+            grid: Fine occupancy grid
+            coarse_path: (N, 2) path planned on the coarse grid
+            coarse_grid: Coarse occupancy grid the path was planned on
+            scale: Fine cells per coarse cell (coarse / fine resolution)
+            margin: Coarse cells the corridor extends around the path
+            detour: Stretches longer than detour times the coarse distance
+                between their ends are rerouted on the coarse grid
+            engine: Search engine class (GridSearch or JumpPointSearch) used
+                in corridor windows and on the coarse grid
+        """
+        self.base = search
+        self.labels, self.components = search.labels, search.components
+        self.grid = grid
+        self.coarse_path = np.asarray(coarse_path, dtype=np.int64).reshape(-1, 2)
+        self.coarse_grid = coarse_grid
+        self.coarse_shape = coarse_grid.shape
+        self.scale = scale
+        self.margin = margin
+        self.detour = detour
+        self.engine = engine
+        self.visit = coarse_visit_order(self.coarse_path, self.coarse_shape)
+        self._coarse_search = None
+        self._windows = OrderedDict()
+        self.corridor_expansions = 0
+        self.fallbacks = 0
+
+    @property
+    def expansions(self):
+        return self.base.expansions + self.corridor_expansions
+
+    @property
+    def unreachable(self):
+        return self.base.unreachable
+
+    def search(self, start, goal):
+        """Search the connector inside the corridor, falling back to the full grid."""
+        i0, i1 = coarse_visit_index(self.visit, start, self.scale), coarse_visit_index(self.visit, goal, self.scale)
+        if i0 < 0 or i1 < 0:
+            return self.base.search(start, goal)
+
+        stretch = self.coarse_path[min(i0, i1):max(i0, i1) + 1]
+        a, b = stretch[0], stretch[-1]
+        if len(stretch) > self.detour * (abs(a[0] - b[0]) + abs(a[1] - b[1]) + 2):
+            route = self._coarse_route(tuple(a), tuple(b))
+            if len(route):
+                stretch = route
+        path = self._corridor_search(start, goal, np.asarray(stretch, dtype=np.int64))
+        if not len(path):
+            self.fallbacks += 1
+            return self.base.search(start, goal)
+        return path
+
+    def _coarse_route(self, a, b):
+        """Shortest coarse-grid connector between two cells of the coarse path."""
+        if self._coarse_search is None:
+            self._coarse_search = self.engine(self.coarse_grid)
+        return self._coarse_search.search(a, b)
+
+    def _corridor_search(self, start, goal, stretch):
+        h, w = self.grid.shape
+        ch, cw = self.coarse_shape
+        m = self.margin
+        r0, c0 = np.maximum(stretch.min(axis=0) - m, 0)
+        r1, c1 = np.minimum(stretch.max(axis=0) + m, [ch - 1, cw - 1])
+
+        # Coarse corridor mask: the stretch dilated by margin cells
+        mask = np.zeros((r1 - r0 + 1 + 2 * m, c1 - c0 + 1 + 2 * m), dtype=bool)
+        for dr in range(2 * m + 1):
+            for dc in range(2 * m + 1):
+                mask[stretch[:, 0] - r0 + dr, stretch[:, 1] - c0 + dc] = True
+        mask = mask[m:-m or None, m:-m or None]
+
+        # Fine window covering the coarse bounding box; the last coarse row and
+        # column also hold every fine cell clipped onto them
+        fr0 = max(int(np.floor((r0 - 0.5) * self.scale)), 0)
+        fr1 = h if r1 == ch - 1 else min(int(np.ceil((r1 + 0.5) * self.scale)) + 1, h)
+        fc0 = max(int(np.floor((c0 - 0.5) * self.scale)), 0)
+        fc1 = w if c1 == cw - 1 else min(int(np.ceil((c1 + 0.5) * self.scale)) + 1, w)
+        rows = np.minimum(np.rint(np.arange(fr0, fr1) / self.scale).astype(np.int64), ch - 1) - r0
+        cols = np.minimum(np.rint(np.arange(fc0, fc1) / self.scale).astype(np.int64), cw - 1) - c0
+        inside = ((rows >= 0) & (rows < mask.shape[0]))[:, None] & ((cols >= 0) & (cols < mask.shape[1]))[None, :]
+        corridor = inside & mask[np.clip(rows, 0, mask.shape[0] - 1)][:, np.clip(cols, 0, mask.shape[1] - 1)]
+
+        window = (self.grid[fr0:fr1, fc0:fc1] != 0) | ~corridor
+        local_start, local_goal = (start[0] - fr0, start[1] - fc0), (goal[0] - fr0, goal[1] - fc0)
+        for r, c in (local_start, local_goal):
+            if not (0 <= r < window.shape[0] and 0 <= c < window.shape[1]) or window[r, c]:
+                return as_path([], self.grid.shape)
+
+        engine = self._window_engine((fr0, fc0), window)
+        expansions = engine.expansions
+        path = engine.search(local_start, local_goal)
+        self.corridor_expansions += engine.expansions - expansions
+        return as_path(path + np.array([fr0, fc0], dtype=path.dtype), self.grid.shape)
+
+    def _window_engine(self, origin, window):
+        """Search engine for the blocked mask window at origin, reused while cached."""
+        key = (origin, window.shape, np.packbits(window).tobytes())
+        engine = self._windows.get(key)
+        if engine is None:
+            engine = self.engine(window.astype(np.uint8))
+            self._windows[key] = engine
+            if len(self._windows) > self.WINDOW_ENGINES:
+                self._windows.popitem(last=False)
+        else:
+            self._windows.move_to_end(key)
+        return engine
+
+
+def coarse_visit_order(path, shape):
+    """Index at which path first visits every cell of a grid of shape, -1 if never."""
+    visit = np.full(shape, -1, dtype=np.int64)
+    path = np.asarray(path, dtype=np.int64).reshape(-1, 2)
+    # Reversed so the earliest visit is written last and wins
+    visit[path[::-1, 0], path[::-1, 1]] = np.arange(len(path))[::-1]
+    return visit
+
+
+def coarse_visit_index(visit, cell, scale):
+    """
+    Coarse path index of the coarse cell holding a fine cell, -1 if unvisited.
+
+    Fine cells along obstacle edges can fall in coarse cells that are blocked
+    at the coarse resolution, so the earliest visited neighbour is used then.
+    """
+    h, w = visit.shape
+    r, c = min(int(round(cell[0] / scale)), h - 1), min(int(round(cell[1] / scale)), w - 1)
+    if visit[r, c] >= 0:
+        return int(visit[r, c])
+    around = visit[max(r - 1, 0):r + 2, max(c - 1, 0):c + 2]
+    visited = around[around >= 0]
+    return int(visited.min()) if visited.size else -1
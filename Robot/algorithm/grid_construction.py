@@ -1,38 +1,173 @@
 """Module for constructing occupancy grids from polygon geometries."""
 import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
 import numpy as np
+import shapely
+from shapely import STRtree
 from shapely.geometry import Point
 
 logger = logging.getLogger(__name__)
 
 
+class GridSizeError(ValueError):
+    """Raised when a wall would rasterize to more cells than allowed."""
+
+
 class Grid():
     """A class for building occupancy grids from wall and obstacle polygons."""
-    
-    def build_grid(self, wall_polygon, obstacle_polygons, resolution=0.1):
+
+    BACKENDS = ("vectorized", "scanline", "pointwise")
+
+    # Grids smaller than this are built in-process even when workers > 1
+    TILED_MIN_CELLS = 1_000_000
+
+    # Side length in cells of the tiles queried against the obstacle index
+    TILE_SIZE = 64
+
+    def build_grid(self, wall_polygon, obstacle_polygons, resolution=0.1, backend="vectorized",
+                   max_grid_size=None, workers=1, shared=False):
         """
         Build an occupancy grid from wall and obstacle polygons.
-        
+
         Args:
             wall_polygon: Polygon defining the valid space
             obstacle_polygons: List of polygons representing obstacles
             resolution: Grid cell size in units
-            
+            backend: Rasterization backend, one of ``Grid.BACKENDS``
+            max_grid_size: Maximum number of cells along either axis, or None
+            workers: Number of processes for tiled construction (0 = all cores)
+            shared: Stitch tiled bands into a shared-memory array
+
         Returns:
             numpy array representing the occupancy grid
+
+        Raises:
+            GridSizeError: If the grid exceeds max_grid_size
+        """
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Unknown grid backend '{backend}', expected one of {self.BACKENDS}")
+
+        height, width = self.grid_shape(wall_polygon.bounds, resolution)
+        if max_grid_size is not None and max(height, width) > max_grid_size:
+            raise GridSizeError(
+                f"Grid of {height}x{width} cells at resolution {resolution} exceeds "
+                f"max_grid_size={max_grid_size}; use a coarser resolution"
+            )
+
+        xs, ys = self.cell_coordinates(wall_polygon.bounds, resolution)
+        workers = workers or os.cpu_count() or 1
+
+        if workers > 1 and height > 1 and height * width >= self.TILED_MIN_CELLS:
+            logger.debug(f"Grid: Rasterizing {height}x{width} grid with {backend} backend on {workers} workers")
+            return self._build_tiled(backend, wall_polygon, obstacle_polygons, xs, ys, workers, shared)
+
+        logger.debug(f"Grid: Rasterizing {height}x{width} grid with {backend} backend")
+        return self.rasterize(backend, wall_polygon, obstacle_polygons, xs, ys)
+
+    def rasterize(self, backend, wall_polygon, obstacle_polygons, xs, ys):
+        """Rasterize the cells at the given sample coordinates with one backend."""
+        if backend == "pointwise":
+            return self._rasterize_pointwise(wall_polygon, obstacle_polygons, xs, ys)
+        if backend == "scanline":
+            return self._rasterize_scanline(wall_polygon, obstacle_polygons, xs, ys)
+        return self._rasterize_vectorized(wall_polygon, obstacle_polygons, xs, ys)
+
+    @staticmethod
+    def grid_shape(bounds, resolution):
+        """Return the (height, width) of the grid covering bounds."""
+        minx, miny, maxx, maxy = bounds
+        return int((maxy - miny) / resolution), int((maxx - minx) / resolution)
+
+    @staticmethod
+    def cell_coordinates(bounds, resolution):
+        """Return the x and y sample coordinates of the grid columns and rows."""
+        minx, miny, _, _ = bounds
+        height, width = Grid.grid_shape(bounds, resolution)
+
+        xs = minx + np.arange(width) * resolution
+        ys = miny + np.arange(height) * resolution
+        return xs, ys
+
+    def patch_grid(self, grid, wall_polygon, obstacle_polygons, resolution, region, backend="vectorized"):
+        """
+        Re-rasterize the cells of an existing grid that fall inside region.
+
+        Used when an obstacle is added or removed: cells outside the changed
+        obstacle's bounding box cannot change, so only that window is rebuilt.
+
+        Args:
+            grid: Occupancy grid previously built for wall_polygon, patched in place
+            wall_polygon: Polygon defining the valid space
+            obstacle_polygons: List of all current obstacle polygons
+            resolution: Grid cell size the grid was built with
+            region: (minx, miny, maxx, maxy) bounds of the changed area
+            backend: Rasterization backend, one of ``Grid.BACKENDS``
+
+        Returns:
+            The patched grid
         """
-        minx, miny, maxx, maxy = wall_polygon.bounds
+        xs, ys = self.cell_coordinates(wall_polygon.bounds, resolution)
+        if grid.shape != (len(ys), len(xs)):
+            raise ValueError(f"Grid shape {grid.shape} does not match wall at resolution {resolution}")
+
+        minx, miny, maxx, maxy = region
+        c0, c1 = np.searchsorted(xs, minx, side="left"), np.searchsorted(xs, maxx, side="right")
+        r0, r1 = np.searchsorted(ys, miny, side="left"), np.searchsorted(ys, maxy, side="right")
+        if c0 >= c1 or r0 >= r1:
+            return grid
+
+        # Only obstacles overlapping the window can affect it
+        wx0, wx1, wy0, wy1 = xs[c0], xs[c1 - 1], ys[r0], ys[r1 - 1]
+        nearby = [
+            obs for obs in obstacle_polygons
+            if obs.bounds[0] <= wx1 and obs.bounds[2] >= wx0 and obs.bounds[1] <= wy1 and obs.bounds[3] >= wy0
+        ]
+        logger.debug(f"Grid: Patching window rows {r0}:{r1}, cols {c0}:{c1} against {len(nearby)} obstacles")
+        grid[r0:r1, c0:c1] = self.rasterize(backend, wall_polygon, nearby, xs[c0:c1], ys[r0:r1])
+        return grid
+
+    def _build_tiled(self, backend, wall_polygon, obstacle_polygons, xs, ys, workers, shared):
+        """Rasterize row bands in a process pool and stitch them into one grid."""
+        shape = (len(ys), len(xs))
+        # A few bands per worker keeps the pool busy when band costs differ
+        bands = [b for b in np.array_split(np.arange(len(ys)), workers * 4) if b.size]
 
-        width = int((maxx - minx) / resolution)
-        height = int((maxy - miny) / resolution)
+        shm = shared_memory.SharedMemory(create=True, size=shape[0] * shape[1]) if shared else None
+        try:
+            if shm is not None:
+                grid = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+            else:
+                grid = np.empty(shape, dtype=np.uint8)
 
-        grid = np.zeros((height, width), dtype=np.uint8)
+            with ProcessPoolExecutor(max_workers=min(workers, len(bands))) as pool:
+                futures = [
+                    pool.submit(_rasterize_band, backend, wall_polygon, obstacle_polygons, xs,
+                                ys[band[0]:band[-1] + 1], band[0], shm.name if shm else None, shape)
+                    for band in bands
+                ]
+                for future in futures:
+                    row0, band_grid = future.result()
+                    if band_grid is not None:
+                        grid[row0:row0 + band_grid.shape[0]] = band_grid
 
-        for r in range(height):
-            for c in range(width):
-                x = minx + c * resolution
-                y = miny + r * resolution
-                p = Point(x, y)
+            if shm is not None:
+                grid = grid.copy()
+        finally:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+
+        return grid
+
+    def _rasterize_pointwise(self, wall_polygon, obstacle_polygons, xs, ys):
+        """Classify every cell with one shapely predicate call per cell."""
+        grid = np.zeros((len(ys), len(xs)), dtype=np.uint8)
+
+        for r in range(len(ys)):
+            for c in range(len(xs)):
+                p = Point(xs[c], ys[r])
 
                 if not wall_polygon.contains(p):
                     grid[r, c] = 1
@@ -44,3 +179,148 @@ class Grid():
                         break
 
         return grid
+
+    def _rasterize_vectorized(self, wall_polygon, obstacle_polygons, xs, ys):
+        """Classify all cells with batched point-in-polygon tests per tile."""
+        x, y = np.meshgrid(xs, ys)
+        free = shapely.contains_xy(wall_polygon, x, y)
+        if not obstacle_polygons:
+            return (~free).astype(np.uint8)
+
+        # Index the obstacles once and only test each tile against the
+        # obstacles whose bounding boxes overlap it.
+        tree = STRtree(obstacle_polygons)
+        tile = self.TILE_SIZE
+        for r0 in range(0, len(ys), tile):
+            r1 = min(r0 + tile, len(ys))
+            for c0 in range(0, len(xs), tile):
+                c1 = min(c0 + tile, len(xs))
+                tile_free = free[r0:r1, c0:c1]
+                if not tile_free.any():
+                    continue
+
+                candidates = tree.query(shapely.box(xs[c0], ys[r0], xs[c1 - 1], ys[r1 - 1]))
+                tile_x, tile_y = x[r0:r1, c0:c1], y[r0:r1, c0:c1]
+                for i in np.sort(candidates):
+                    # Only cells that are still free can change state
+                    idx = np.nonzero(tile_free)
+                    if not idx[0].size:
+                        break
+                    inside = shapely.contains_xy(obstacle_polygons[i], tile_x[idx], tile_y[idx])
+                    tile_free[idx[0][inside], idx[1][inside]] = False
+
+        return (~free).astype(np.uint8)
+
+    def _rasterize_scanline(self, wall_polygon, obstacle_polygons, xs, ys):
+        """Fill polygon spans row by row from an edge table, without predicates."""
+        free = np.zeros((len(ys), len(xs)), dtype=bool)
+        r0, c0, inside = self._scanline_window(wall_polygon, xs, ys)
+        free[r0:r0 + inside.shape[0], c0:c0 + inside.shape[1]] = inside
+
+        # Each obstacle only touches the window of its own bounding box
+        for obs in obstacle_polygons:
+            r0, c0, inside = self._scanline_window(obs, xs, ys)
+            free[r0:r0 + inside.shape[0], c0:c0 + inside.shape[1]] &= ~inside
+
+        return (~free).astype(np.uint8)
+
+    @staticmethod
+    def _edge_table(polygon):
+        """Return an (E, 4) array of x0, y0, x1, y1 edges over all polygon rings."""
+        rings = [polygon.exterior, *polygon.interiors]
+        edges = []
+        for ring in rings:
+            coords = np.asarray(ring.coords, dtype=np.float64)
+            edges.append(np.hstack([coords[:-1], coords[1:]]))
+        return np.vstack(edges)
+
+    def _scanline_window(self, polygon, xs, ys):
+        """
+        Mask the sample points strictly inside polygon within its bounding box.
+
+        Points on the boundary are outside, matching ``Polygon.contains``.
+
+        Returns:
+            Tuple of (first row, first column, boolean mask of the window)
+        """
+        minx, miny, maxx, maxy = polygon.bounds
+        r0, r1 = np.searchsorted(ys, miny, side="left"), np.searchsorted(ys, maxy, side="right")
+        c0, c1 = np.searchsorted(xs, minx, side="left"), np.searchsorted(xs, maxx, side="right")
+        if r0 >= r1 or c0 >= c1:
+            return r0, c0, np.zeros((0, 0), dtype=bool)
+
+        rows, xs = ys[r0:r1], xs[c0:c1]
+        edges = self._edge_table(polygon)
+        x0, y0, x1, y1 = (edges[:, i] for i in range(4))
+        ylo, yhi = np.minimum(y0, y1), np.maximum(y0, y1)
+
+        # Half-open crossing rule: each edge counts for ylo <= y < yhi, which
+        # skips horizontal edges and counts shared vertices exactly once.
+        y = rows[:, None]
+        crosses = (ylo <= y) & (y < yhi)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            xcross = x0 + (y - y0) * (x1 - x0) / (y1 - y0)
+        xcross = np.where(crosses, xcross, np.inf)
+
+        # Sample points within rounding distance of a slanted edge are
+        # resolved with an exact predicate below.
+        near_rows, near_edges = np.nonzero(crosses & (x0 != x1))
+        near_x = xcross[near_rows, near_edges]
+        tol = 1e-9 * (1.0 + np.abs(near_x))
+        near_lo = np.searchsorted(xs, near_x - tol, side="left")
+        near_hi = np.searchsorted(xs, near_x + tol, side="right")
+        ambiguous = near_lo < near_hi
+        near_rows, near_cols = near_rows[ambiguous], near_lo[ambiguous]
+
+        xcross = np.sort(xcross, axis=1)
+
+        # Even-odd fill: consecutive crossing pairs bound the inside spans
+        starts, ends = xcross[:, 0::2], xcross[:, 1::2]
+        span_rows, span_idx = np.nonzero(np.isfinite(starts))
+        span_start = np.searchsorted(xs, starts[span_rows, span_idx], side="right")
+        span_end = np.searchsorted(xs, ends[span_rows, span_idx], side="left")
+        keep = span_start < span_end
+
+        spans = np.zeros((len(rows), len(xs) + 1), dtype=np.int32)
+        np.add.at(spans, (span_rows[keep], span_start[keep]), 1)
+        np.add.at(spans, (span_rows[keep], span_end[keep]), -1)
+        inside = np.cumsum(spans[:, :-1], axis=1) > 0
+
+        # Horizontal edges and vertices lie on the boundary but produce no
+        # crossing of their own, so clear them explicitly.
+        for ex0, ey, ex1 in edges[y0 == y1][:, [0, 1, 2]]:
+            r = np.searchsorted(rows, ey)
+            if r < len(rows) and rows[r] == ey:
+                lo, hi = min(ex0, ex1), max(ex0, ex1)
+                inside[r, np.searchsorted(xs, lo, side="left"):np.searchsorted(xs, hi, side="right")] = False
+        vr = np.searchsorted(rows, y0)
+        vc = np.searchsorted(xs, x0)
+        on_vertex = (vr < len(rows)) & (vc < len(xs))
+        on_vertex[on_vertex] &= (rows[vr[on_vertex]] == y0[on_vertex]) & (xs[vc[on_vertex]] == x0[on_vertex])
+        inside[vr[on_vertex], vc[on_vertex]] = False
+
+        if near_rows.size:
+            inside[near_rows, near_cols] = shapely.contains_xy(polygon, xs[near_cols], rows[near_rows])
+
+        return r0, c0, inside
+
+
+def _rasterize_band(backend, wall_polygon, obstacle_polygons, xs, ys, row0, shm_name, shape):
+    """
+    Process pool task rasterizing one row band of a tiled grid.
+
+    Writes the band straight into the shared grid when shm_name is given,
+    otherwise returns it to be stitched by the caller.
+    """
+    band_grid = Grid().rasterize(backend, wall_polygon, obstacle_polygons, xs, ys)
+    if shm_name is None:
+        return row0, band_grid
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        grid = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+        grid[row0:row0 + band_grid.shape[0]] = band_grid
+        del grid
+    finally:
+        shm.close()
+    return row0, None
@@ -1,5 +1,6 @@
 """Module for computing path coverage metrics."""
 import logging
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
@@ -8,19 +9,45 @@ class Metrics():
     """Class for computing metrics on robot paths."""
 
     def compute_metrics(self, path, grid):
-        """Compute coverage and path length metrics."""
+        """
+        Compute coverage, path length and path quality metrics in one pass.
+
+        Everything is measured on the final path, so coverage counts the cells
+        connectors pass over as well as the sweep segments. The segments
+        themselves are not needed.
+
+        Args:
+            path: (N, 2) path array of (r, c) cells, or a sequence of them
+            grid: 2D array representing the grid
+
+        Returns:
+            Dictionary with coverage, path_length, turns, revisited_cells
+            and connector_overhead (share of steps spent on covered cells)
+        """
         logger.debug(f"Metrics: Computing metrics for path of length {len(path)}")
-        covered = set(path)
+        h, w = grid.shape
+        free_cells = int(np.count_nonzero(grid == 0))
+        cells = np.asarray(path, dtype=np.int64).reshape(-1, 2)
+        path_length = len(cells)
+
+        visited = np.zeros(h * w, dtype=bool)
+        visited[cells[:, 0] * w + cells[:, 1]] = True
+        distinct = int(np.count_nonzero(visited))
+        covered = int(np.count_nonzero(visited & (grid.ravel() == 0)))
+        revisited = path_length - distinct
 
-        free_cells = sum(
-            1 for r in range(grid.shape[0])
-            for c in range(grid.shape[1])
-            if grid[r, c] == 0
-        )
+        # A turn is a change of direction between two consecutive unit moves
+        steps = np.diff(cells, axis=0)
+        unit = np.abs(steps).sum(axis=1) == 1
+        changed = np.any(steps[1:] != steps[:-1], axis=1)
+        turns = int(np.count_nonzero(changed & unit[1:] & unit[:-1]))
 
-        coverage = len(covered) / free_cells if free_cells else 0
+        coverage = covered / free_cells if free_cells else 0
 
         return {
             "coverage": round(coverage, 3),
-            "path_length": len(path)
-        }
\ No newline at end of file
+            "path_length": path_length,
+            "turns": turns,
+            "revisited_cells": revisited,
+            "connector_overhead": round(revisited / path_length, 3) if path_length else 0.0
+        }
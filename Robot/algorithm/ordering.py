@@ -0,0 +1,213 @@
+"""Module for ordering sweep segments to minimize connector travel."""
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def order_cost(segments):
+    """Total Manhattan distance of the gaps between consecutive segments."""
+    return sum(
+        abs(a.last[0] - b.first[0]) + abs(a.last[1] - b.first[1])
+        for a, b in zip(segments, segments[1:])
+    )
+
+
+def optimize_order(segments, max_iterations):
+    """
+    Reorder and reverse segments to shorten the gaps between them.
+
+    The first segment stays in place as the starting point. A nearest-
+    neighbour tour is built and kept only if it beats the given order, then
+    2-opt and Or-opt moves improve it until no move helps or max_iterations
+    iterations are used up. An iteration places one segment of the greedy
+    tour or tries the moves at one tour position, each a vectorized pass over
+    the segments, so the work is bounded without looking at the clock and
+    the result depends only on the input. Gaps are measured as Manhattan
+    distance between segment endpoints, the lower bound of every connector,
+    and only improving moves are taken, so the result is never worse than
+    the input order.
+
+    Args:
+        segments: Segments in their original travel order; each needs first,
+                  last and reversed()
+        max_iterations: Iterations the optimizer may spend
+
+    Returns:
+        List of segments, some possibly reversed
+    """
+    n = len(segments)
+    if n < 3 or max_iterations <= 0:
+        return list(segments)
+
+    firsts = np.array([seg.first for seg in segments], dtype=np.int64)
+    lasts = np.array([seg.last for seg in segments], dtype=np.int64)
+    tour = _SegmentTour(firsts, lasts, iterations=max_iterations)
+    original_cost = tour.cost()
+
+    if max_iterations >= n:
+        candidate = _SegmentTour(firsts, lasts, *_nearest_neighbour(firsts, lasts),
+                                 iterations=max_iterations - (n - 1))
+        if candidate.cost() < original_cost:
+            tour = candidate
+
+    improved = True
+    while improved and tour.iterations > 0:
+        improved = tour.two_opt()
+        improved = tour.or_opt() or improved
+
+    cost = tour.cost()
+    logger.debug(f"Ordering: {n} segments, gap cost {original_cost} -> {cost}, "
+                 f"{max_iterations - tour.iterations} iterations")
+    return [
+        segments[i].reversed() if flipped else segments[i]
+        for i, flipped in zip(tour.order.tolist(), tour.flipped.tolist())
+    ]
+
+
+def _manhattan(a, b):
+    return np.abs(a - b).sum(axis=-1)
+
+
+def _nearest_neighbour(firsts, lasts):
+    """
+    Greedy tour from the first segment, entering each next segment at its
+    nearer end. Returns (order, flipped).
+    """
+    n = len(firsts)
+    order = [0]
+    flipped = [False]
+    free = np.ones(n, dtype=bool)
+    free[0] = False
+    position = lasts[0]
+
+    for _ in range(n - 1):
+        to_first = np.where(free, _manhattan(firsts, position), np.iinfo(np.int64).max)
+        to_last = np.where(free, _manhattan(lasts, position), np.iinfo(np.int64).max)
+        i_first, i_last = int(to_first.argmin()), int(to_last.argmin())
+        if to_last[i_last] < to_first[i_first]:
+            order.append(i_last)
+            flipped.append(True)
+            position = firsts[i_last]
+        else:
+            order.append(i_first)
+            flipped.append(False)
+            position = lasts[i_first]
+        free[order[-1]] = False
+
+    return np.array(order), np.array(flipped)
+
+
+class _SegmentTour():
+    """
+    Segment order with per-segment orientation and local-search moves.
+
+    iterations counts down the tour positions the moves may still try.
+    """
+
+    def __init__(self, firsts, lasts, order=None, flipped=None, iterations=0):
+        self.firsts = firsts
+        self.lasts = lasts
+        self.order = np.arange(len(firsts)) if order is None else order
+        self.flipped = np.zeros(len(firsts), dtype=bool) if flipped is None else flipped
+        self.iterations = iterations
+
+    def ends(self):
+        """Entry and exit cell of every segment in tour order."""
+        entry = np.where(self.flipped[:, None], self.lasts[self.order], self.firsts[self.order])
+        exit_ = np.where(self.flipped[:, None], self.firsts[self.order], self.lasts[self.order])
+        return entry, exit_
+
+    def cost(self):
+        entry, exit_ = self.ends()
+        return int(_manhattan(exit_[:-1], entry[1:]).sum())
+
+    def two_opt(self):
+        """
+        Reverse the stretch i..j that shortens the tour most, for every i.
+
+        Returns:
+            True when any reversal was applied
+        """
+        n = len(self.order)
+        improved = False
+        entry, exit_ = self.ends()
+        for i in range(1, n):
+            if self.iterations <= 0:
+                break
+            self.iterations -= 1
+            j = np.arange(i, n)
+            has_next = j + 1 < n
+            nxt = np.minimum(j + 1, n - 1)
+            # Old gaps exit[i-1]->entry[i] and exit[j]->entry[j+1], new ones exit[i-1]->exit[j] and entry[i]->entry[j+1]
+            delta = (_manhattan(exit_[i - 1], exit_[j]) - _manhattan(exit_[i - 1], entry[i])
+                     + np.where(has_next,
+                                _manhattan(entry[i], entry[nxt]) - _manhattan(exit_[j], entry[nxt]), 0))
+            best = int(delta.argmin())
+            if delta[best] < 0:
+                j = i + best
+                self.order[i:j + 1] = self.order[i:j + 1][::-1].copy()
+                self.flipped[i:j + 1] = ~self.flipped[i:j + 1][::-1]
+                entry, exit_ = self.ends()
+                improved = True
+        return improved
+
+    def or_opt(self, max_chain=3):
+        """
+        Move chains of up to max_chain segments to the gap where they fit
+        best, possibly reversed.
+
+        Returns:
+            True when any move was applied
+        """
+        improved = False
+        i = 1
+        while i < len(self.order) and self.iterations > 0:
+            self.iterations -= 1
+            if any(self._move_chain(i, k) for k in range(1, max_chain + 1) if i + k <= len(self.order)):
+                # Every move shortens the tour, so retrying position i terminates
+                improved = True
+            else:
+                i += 1
+        return improved
+
+    def _move_chain(self, i, k):
+        """Move the chain order[i:i+k] to its best gap if that shortens the tour."""
+        n = len(self.order)
+        entry, exit_ = self.ends()
+        head, tail = entry[i], exit_[i + k - 1]
+        # Gain from closing the gap the chain leaves behind
+        removed = _manhattan(exit_[i - 1], head)
+        if i + k < n:
+            removed += _manhattan(tail, entry[i + k]) - _manhattan(exit_[i - 1], entry[i + k])
+
+        # Gaps after position p of the tour without the chain, p = -1 meaning none
+        rest = np.concatenate((np.arange(i), np.arange(i + k, n)))
+        rest_entry, rest_exit = entry[rest], exit_[rest]
+        prev_exit = rest_exit
+        next_entry = np.concatenate((rest_entry[1:], rest_entry[:1]))
+        has_next = np.arange(len(rest)) + 1 < len(rest)
+
+        def inserted(a, b):
+            return _manhattan(prev_exit, a) + np.where(
+                has_next, _manhattan(b, next_entry) - _manhattan(prev_exit, next_entry), 0)
+
+        forward = inserted(head, tail)
+        backward = inserted(tail, head)
+        # Putting the chain back where it was is no move
+        forward[i - 1] = np.iinfo(np.int64).max
+
+        p_forward, p_backward = int(forward.argmin()), int(backward.argmin())
+        reverse = backward[p_backward] < forward[p_forward]
+        p = p_backward if reverse else p_forward
+        if min(forward[p_forward], backward[p_backward]) - removed >= 0:
+            return False
+
+        chain_order = self.order[i:i + k]
+        chain_flipped = self.flipped[i:i + k]
+        if reverse:
+            chain_order, chain_flipped = chain_order[::-1], ~chain_flipped[::-1]
+        rest_order, rest_flipped = self.order[rest], self.flipped[rest]
+        self.order = np.concatenate((rest_order[:p + 1], chain_order, rest_order[p + 1:]))
+        self.flipped = np.concatenate((rest_flipped[:p + 1], chain_flipped, rest_flipped[p + 1:]))
+        return True
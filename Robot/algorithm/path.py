@@ -0,0 +1,90 @@
+"""Compact (N, 2) array representation of grid paths."""
+import numpy as np
+
+
+def path_dtype(shape):
+    """Smallest integer dtype that holds every cell index of a grid of shape."""
+    return np.int16 if max(shape, default=0) <= np.iinfo(np.int16).max else np.int32
+
+
+def as_path(cells, shape=None):
+    """
+    Convert cells to an (N, 2) path array.
+
+    Args:
+        cells: Sequence of (r, c) cells or an array of them
+        shape: Grid shape used to pick the dtype; int32 when omitted
+    """
+    dtype = path_dtype(shape) if shape is not None else np.int32
+    return np.asarray(cells, dtype=dtype).reshape(-1, 2)
+
+
+def concat_paths(pieces, shape):
+    """Join (N, 2) path pieces into one path array sized for a grid of shape."""
+    dtype = path_dtype(shape)
+    if not pieces:
+        return np.empty((0, 2), dtype=dtype)
+    return np.concatenate(pieces).astype(dtype, copy=False)
+
+
+def line_cells(line, start, end, axis=0):
+    """
+    Cells from index start to end (inclusive) along one grid line.
+
+    Args:
+        axis: 0 when line is a row index, 1 when it is a column index
+    """
+    step = 1 if end >= start else -1
+    along = np.arange(start, end + step, step, dtype=np.int32)
+    fixed = np.full(len(along), line, dtype=np.int32)
+    return np.stack((fixed, along) if axis == 0 else (along, fixed), axis=1)
+
+
+def to_waypoints(path):
+    """
+    Compress a path into polylines of its turn points.
+
+    A polyline keeps its end cells and every cell where the step direction
+    changes, so all its pieces are axis-aligned. A step that is not a single
+    4-neighbour move (e.g. a jump between free regions) starts a new polyline.
+    from_waypoints restores the exact cells.
+
+    Returns:
+        List of polylines, each a list of [r, c] waypoints
+    """
+    path = np.asarray(path).reshape(-1, 2)
+    if not len(path):
+        return []
+    steps = np.diff(path.astype(np.int64), axis=0)
+    jump = np.abs(steps).sum(axis=1) > 1
+
+    keep = np.ones(len(path), dtype=bool)
+    # Inner cells are dropped while the step into and out of them is the same move
+    keep[1:-1] = np.any(steps[1:] != steps[:-1], axis=1) | jump[1:] | jump[:-1]
+
+    breaks = np.flatnonzero(jump) + 1
+    return [
+        path[start:stop][keep[start:stop]].tolist()
+        for start, stop in zip(np.concatenate(([0], breaks)), np.concatenate((breaks, [len(path)])))
+    ]
+
+
+def from_waypoints(polylines, shape=None):
+    """
+    Expand waypoint polylines from to_waypoints back into a path array.
+
+    Args:
+        polylines: List of polylines, each a list of [r, c] waypoints
+        shape: Grid shape used to pick the dtype; int32 when omitted
+    """
+    pieces = []
+    for polyline in polylines:
+        points = np.asarray(polyline, dtype=np.int64).reshape(-1, 2)
+        steps = np.diff(points, axis=0)
+        counts = np.maximum(np.abs(steps).max(axis=1, initial=0), 1)
+        # Offset k = 1..count of every expanded cell from the waypoint it leaves
+        offsets = np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts) + 1
+        cells = np.repeat(points[:-1], counts, axis=0) + np.repeat(np.sign(steps), counts, axis=0) * offsets[:, None]
+        pieces.append(points[:1])
+        pieces.append(cells)
+    return as_path(np.concatenate(pieces) if pieces else np.empty((0, 2)), shape)
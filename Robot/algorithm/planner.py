@@ -1,8 +1,20 @@
 """Main planning module that coordinates sweep and pathfinding algorithms."""
 import logging
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing.util
+from multiprocessing import shared_memory
+import numpy as np
 from algorithm.sweep import Sweep
-from algorithm.algorithms import Algorithms
+from algorithm.algorithms import (
+    Algorithms, GridSearch, JumpPointSearch, ConnectorCache, CachedSearch, CorridorSearch,
+    coarse_visit_order, coarse_visit_index, grid_fingerprint
+)
 from algorithm.metrics import Metrics
+from algorithm.ordering import optimize_order
+from algorithm.path import concat_paths
 
 logger = logging.getLogger(__name__)
 
@@ -10,45 +22,546 @@ sweep = Sweep(robot=None)  # Pass None since we don't need robot instance yet
 algorithms = Algorithms()
 metrics_calculator = Metrics()
 
-def build_full_path(grid, segments):
-    path = []
+# Connector paths shared across strategies and replans of unchanged grids
+connector_cache = ConnectorCache()
+
+# Strategy pool of this process, created on first use
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+# Grid a strategy pool worker last attached to (key, shm, grid, searches)
+_worker_grid = {}
+
+# Connector search engines selectable per plan
+CONNECTORS = {
+    "astar": GridSearch,
+    "jps": JumpPointSearch
+}
+
+# Coverage strategies evaluated for every plan, in registration order.
+# Pool workers look strategies up here by name.
+STRATEGIES = {}
+
+
+def register_strategy(name):
+    """
+    Register a coverage strategy under name.
+
+    A strategy is a callable taking the grid and returning the segments to
+    cover in travel order. Segments need first, last, length, cells() and
+    reversed().
+    """
+    def decorator(fn):
+        if name in STRATEGIES:
+            raise ValueError(f"Strategy '{name}' is already registered")
+        STRATEGIES[name] = fn
+        return fn
+    return decorator
+
+
+@register_strategy("horizontal")
+def horizontal_strategy(grid):
+    return sweep.horizontal_sweep(grid)
+
+
+@register_strategy("vertical")
+def vertical_strategy(grid):
+    return sweep.vertical_sweep(grid)
+
+
+@register_strategy("boustrophedon")
+def boustrophedon_strategy(grid):
+    return sweep.boustrophedon(grid)
+
+
+def order_by_component(segments, labels):
+    """
+    Group segments by the free region they lie in.
+
+    Regions are visited in the order the sweep first reaches them and the
+    sweep order is kept inside each region, so connectors never have to
+    cross between regions.
+
+    Returns:
+        Tuple of (ordered segments, number of jumps between regions)
+    """
+    components = [int(labels[seg.first]) for seg in segments]
+    rank = {}
+    for component in components:
+        rank.setdefault(component, len(rank))
+
+    order = sorted(range(len(segments)), key=lambda i: rank[components[i]])
+    return [segments[i] for i in order], max(len(rank) - 1, 0)
+
+
+def optimize_by_component(segments, labels, max_iterations):
+    """
+    Optimize the segment order inside each free region, spending at most
+    max_iterations optimizer iterations per region.
+
+    Expects segments grouped by region, as returned by order_by_component.
+    """
+    ordered = []
+    start = 0
+    for end in range(1, len(segments) + 1):
+        if end == len(segments) or labels[segments[end].first] != labels[segments[start].first]:
+            ordered.extend(optimize_order(segments[start:end], max_iterations))
+            start = end
+    return ordered
+
+
+def order_by_coarse_path(segments, coarse_path, coarse_shape, scale):
+    """
+    Order fine segments the way a coarse-resolution path travels.
+
+    Each segment is keyed by the earliest coarse path index among the coarse
+    cells holding its ends. It is reversed when the coarse path reaches its
+    last cell first. Segments off the coarse path keep their order at the end.
+    """
+    visit = coarse_visit_order(coarse_path, coarse_shape)
+    unvisited = len(coarse_path)
+
+    def visited(cell):
+        index = coarse_visit_index(visit, cell, scale)
+        return index if index >= 0 else unvisited
+
+    keyed = []
+    for seg in segments:
+        first, last = visited(seg.first), visited(seg.last)
+        keyed.append((min(first, last), seg.reversed() if last < first else seg))
+    return [seg for _, seg in sorted(keyed, key=lambda item: item[0])]
+
+
+def build_full_path(grid, segments, search=None, length_limit=None, deadline=None):
+    """
+    Chain segments into one path with connector searches between them.
+
+    Args:
+        length_limit: Abandon the path once it can no longer end up shorter
+                      than this many cells
+        deadline: Abandon the path once time.perf_counter() passes this
+
+    Returns:
+        (N, 2) path array of (r, c) cells, or None when the path was abandoned
+    """
+    if search is None:
+        search = GridSearch(grid)
+    pieces = []
+    length = 0
+    # Cells still to be added by the remaining segments, a lower bound on the rest of the path
+    remaining = sum(seg.length for seg in segments)
 
     for i, seg in enumerate(segments):
-        path.extend(seg)
+        pieces.append(seg.cells())
+        length += seg.length
+        remaining -= seg.length
 
         if i + 1 < len(segments):
-            connector = algorithms.astar(grid, seg[-1], segments[i + 1][0])
-            if connector:
-                path.extend(connector[1:])
+            connector = search.search(seg.last, segments[i + 1].first)
+            if len(connector):
+                pieces.append(connector[1:])
+                length += len(connector) - 1
 
-    return path
+        if length_limit is not None and length + remaining >= length_limit:
+            logger.debug(f"Planning: Abandoned path after {i + 1}/{len(segments)} segments "
+                         f"at length {length} (limit {length_limit})")
+            return None
+        if deadline is not None and time.perf_counter() > deadline:
+            logger.debug(f"Planning: Abandoned path after {i + 1}/{len(segments)} segments at the deadline")
+            return None
 
+    return concat_paths(pieces, grid.shape)
 
-def plan(grid):
-    logger.info(f"Planning: Starting path planning for grid of shape {grid.shape}")
-    candidates = []
 
-    sweep_methods = {
-        "horizontal": sweep.horizontal_sweep,
-        "vertical": sweep.vertical_sweep
+def rank(candidate):
+    """Sort key of a candidate: higher coverage first, then shorter path."""
+    return (candidate["metrics"]["coverage"], -candidate["metrics"]["path_length"])
+
+
+def reachable_coverage(grid, segments, labels):
+    """
+    Upper bound on the coverage of a path through segments.
+
+    Connectors never leave a free region, so the path can at most cover the
+    free regions its segments lie in.
+    """
+    free_cells = int(np.count_nonzero(grid == 0))
+    if not free_cells or not segments:
+        return 0
+    regions = np.unique([labels[seg.first] for seg in segments])
+    sizes = np.bincount(labels[labels >= 0], minlength=int(regions.max()) + 1)
+    return round(int(sizes[regions].sum()) / free_cells, 3)
+
+
+def make_search(grid, connector, fingerprint=None):
+    """Build the cached connector search engine for grid."""
+    if fingerprint is None:
+        fingerprint = grid_fingerprint(grid)
+    return CachedSearch(CONNECTORS[connector](grid), connector_cache, (fingerprint, connector))
+
+
+def evaluate_strategy(grid, name, search, best=None, segments=None, ordering_iterations=0, deadline=None):
+    """
+    Run one strategy and return its candidate with metrics.
+
+    Args:
+        segments: Precomputed segments of the strategy, e.g. from Sweep.angle_sweeps
+                  over several angles; computed with STRATEGIES[name] when omitted
+        ordering_iterations: Optimizer iterations per free region spent
+                             reordering segments to shorten connectors before
+                             they are searched
+        deadline: time.perf_counter() value after which the strategy is
+                  abandoned with reason "deadline"
+
+    When best is given, the strategy is abandoned as soon as it can no longer
+    outrank it, and a pruned record {"strategy", "reason", "bound"} is
+    returned instead.
+    """
+    logger.debug(f"Planning: Running {name} strategy")
+    if segments is None:
+        segments = STRATEGIES[name](grid)
+    segments, jumps = order_by_component(segments, search.labels)
+    if ordering_iterations > 0:
+        segments = optimize_by_component(segments, search.labels, ordering_iterations)
+
+    length_limit = None
+    if best is not None:
+        bound = reachable_coverage(grid, segments, search.labels)
+        if bound < best["metrics"]["coverage"]:
+            logger.info(f"Planning: {name} strategy pruned - coverage bound {bound:.2%} below best")
+            return {"strategy": name, "reason": "coverage", "bound": bound}
+        if bound == best["metrics"]["coverage"]:
+            length_limit = best["metrics"]["path_length"]
+
+    expansions = search.expansions
+    full_path = build_full_path(grid, segments, search, length_limit, deadline)
+    if full_path is None and deadline is not None and time.perf_counter() > deadline:
+        logger.info(f"Planning: {name} strategy skipped - deadline reached")
+        return {"strategy": name, "reason": "deadline", "bound": None}
+    if full_path is None:
+        logger.info(f"Planning: {name} strategy pruned - cannot be shorter than {length_limit}")
+        return {"strategy": name, "reason": "path_length", "bound": length_limit}
+
+    logger.debug(f"Planning: {name} connectors expanded {search.expansions - expansions} nodes "
+                 f"({len(segments)} segments)")
+    metrics = metrics_calculator.compute_metrics(full_path, grid)
+    metrics["components"] = search.components
+    metrics["cross_component_jumps"] = jumps
+    logger.info(f"Planning: {name} strategy - coverage: {metrics['coverage']:.2%}, length: {metrics['path_length']}")
+
+    return {
+        "strategy": name,
+        "path": full_path,
+        "metrics": metrics
     }
 
-    for name, sweep_fn in sweep_methods.items():
-        logger.debug(f"Planning: Running {name} sweep")
-        segments = sweep_fn(grid)
-        full_path = build_full_path(grid, segments)
-        metrics = metrics_calculator.compute_metrics(full_path, grid)
-        logger.info(f"Planning: {name} strategy - coverage: {metrics['coverage']:.2%}, length: {metrics['path_length']}")
 
-        candidates.append({
-            "strategy": name,
-            "path": full_path,
-            "metrics": metrics
-        })
+def sweep_name(angle):
+    """Strategy name of the angled sweep at angle degrees."""
+    return f"sweep_{angle:g}"
+
+
+def plan(grid, connector="astar", workers=1, prune=True, sweep_angles=None, ordering_iterations=0,
+         time_budget=None, coarse_grid=None, coarse_scale=None):
+    """
+    Plan coverage paths for grid with every registered strategy.
+
+    Args:
+        grid: Occupancy grid (0 free, 1 blocked)
+        connector: Connector search engine name from CONNECTORS
+        workers: Processes evaluating strategies concurrently; 1 runs them
+                 in this process one after another
+        prune: Abandon strategies that cannot outrank the best so far
+               (sequential evaluation only)
+        sweep_angles: Extra sweep angles in degrees, swept one after the other and
+                      evaluated as strategies named sweep_<angle>
+        ordering_iterations: Optimizer iterations per free region for the
+                             segment ordering optimizer; 0 keeps the
+                             strategy's own order
+        time_budget: Seconds after which remaining strategies are skipped.
+                     Strategies with the fewest segments to connect run
+                     first and the first one always completes.
+        coarse_grid: Grid of the same wall at a coarser resolution. All
+                     strategies are planned on it first, and only the best
+                     one is refined on grid, ordered along its coarse path
+                     with connectors searched in corridors around it.
+        coarse_scale: Coarse resolution divided by the resolution of grid
+
+    Returns:
+        Dict with the best candidate, the completed candidates in evaluation
+        order, the pruned strategies, the names of strategies skipped at the
+        deadline and the best completed sweep angle (None without
+        sweep_angles or when every angled sweep was pruned or skipped)
+    """
+    logger.info(f"Planning: Starting path planning for grid of shape {grid.shape} with {connector} connectors")
+    if connector not in CONNECTORS:
+        raise ValueError(f"Unknown connector search '{connector}', expected one of {tuple(CONNECTORS)}")
+    if coarse_grid is not None:
+        return _plan_coarse_to_fine(grid, coarse_grid, coarse_scale, connector, workers, prune,
+                                    sweep_angles, ordering_iterations, time_budget)
+
+    angles = list(dict.fromkeys(float(a) for a in sweep_angles or []))
+    # (strategy name, sweep angle) per candidate; registered strategies have no angle
+    tasks = [(name, None) for name in STRATEGIES] + [(sweep_name(a), a) for a in angles]
+    deadline = time.perf_counter() + time_budget if time_budget is not None else None
+    candidates = []
+    pruned = []
+    skipped = []
+
+    if workers > 1 and len(tasks) > 1:
+        candidates, skipped = _evaluate_parallel(grid, tasks, connector, workers, ordering_iterations, deadline)
+    else:
+        # One search engine per grid, shared by every strategy
+        search = make_search(grid, connector)
+        angled = sweep.angle_sweeps(grid, angles) if angles else {}
+        segments = {name: angled.get(angle) for name, angle in tasks}
+        if deadline is not None:
+            # Fewer segments means fewer connector searches, so those strategies finish first
+            segments = {name: STRATEGIES[name](grid) if segs is None else segs for name, segs in segments.items()}
+            tasks.sort(key=lambda task: len(segments[task[0]]))
+
+        best = None
+        for name, angle in tasks:
+            if candidates and deadline is not None and time.perf_counter() > deadline:
+                skipped.append(name)
+                continue
+            # The first strategy always runs to completion so there is a plan to return
+            result = evaluate_strategy(grid, name, search, best if prune else None, segments[name],
+                                       ordering_iterations, deadline if candidates else None)
+            if result.get("reason") == "deadline":
+                skipped.append(name)
+                continue
+            if "path" not in result:
+                pruned.append(result)
+                continue
+            if angle is not None:
+                result["angle"] = angle
+            candidates.append(result)
+            if best is None or rank(result) > rank(best):
+                best = result
+
+        if skipped:
+            logger.info(f"Planning: Deadline reached, skipped strategies {skipped}")
 
-    best = max(candidates, key=lambda c: c["metrics"]["coverage"])
+    best = max(candidates, key=rank)
+    swept = [c for c in candidates if "angle" in c]
 
     return {
         "best": best,
-        "candidates": candidates
+        "candidates": candidates,
+        "pruned": pruned,
+        "skipped": skipped,
+        "best_angle": max(swept, key=rank)["angle"] if swept else None
+    }
+
+
+def _plan_coarse_to_fine(grid, coarse_grid, scale, connector, workers, prune, sweep_angles,
+                         ordering_iterations, time_budget):
+    """
+    Plan on coarse_grid, then refine its best strategy on grid.
+
+    The refinement gets whatever the coarse plan left of time_budget. When it
+    runs out before the refinement completes, the cheapest strategy is
+    planned on grid directly instead, so there is still a plan to return.
+    """
+    started = time.perf_counter()
+    deadline = started + time_budget if time_budget is not None else None
+    coarse = plan(coarse_grid, connector, workers, prune, sweep_angles, ordering_iterations, time_budget)
+    best = coarse["best"]
+    name, angle = best["strategy"], best.get("angle")
+    logger.info(f"Planning: Refining coarse {coarse_grid.shape} {name} plan on {grid.shape} grid")
+
+    segments = sweep.angle_sweeps(grid, [angle])[angle] if angle is not None else STRATEGIES[name](grid)
+    segments = order_by_coarse_path(segments, best["path"], coarse_grid.shape, scale)
+    search = CorridorSearch(make_search(grid, connector), grid, best["path"], coarse_grid, scale,
+                            engine=CONNECTORS[connector])
+    # The coarse plan already paid for ordering, so the refinement keeps its order
+    candidate = evaluate_strategy(grid, name, search, segments=segments, deadline=deadline)
+    logger.info(f"Planning: Refinement searched {search.corridor_expansions} corridor nodes, "
+                f"{search.fallbacks} connectors fell back to the full grid")
+    if candidate.get("reason") == "deadline":
+        logger.info(f"Planning: Deadline reached while refining {name}, planning on {grid.shape} grid directly")
+        direct = plan(grid, connector, workers, prune, None, ordering_iterations, 0)
+        planned = {c["strategy"] for c in direct["candidates"]}
+        direct["skipped"] = [n for n in dict.fromkeys(coarse["skipped"] + [name] + direct["skipped"])
+                             if n not in planned]
+        logger.info(f"Planning: Coarse-to-fine plan took {time.perf_counter() - started:.3f}s")
+        return direct
+    if angle is not None:
+        candidate["angle"] = angle
+
+    # Strategies that lost on the coarse grid are not refined. Their coarse
+    # path lengths, scaled to fine cells (a coverage path visits every free
+    # cell, so scale ** 2 per coarse cell), are estimates rather than bounds:
+    # a refined path can come out shorter or longer
+    pruned = [
+        {"strategy": p["strategy"], "reason": "coarse", "bound": None,
+         "estimated_length": round(p["bound"] * scale ** 2) if p["reason"] == "path_length" else None}
+        for p in coarse["pruned"]
+    ] + [
+        {"strategy": c["strategy"], "reason": "coarse", "bound": None,
+         "estimated_length": round(c["metrics"]["path_length"] * scale ** 2)}
+        for c in coarse["candidates"] if c is not best
+    ]
+    logger.info(f"Planning: Coarse-to-fine plan took {time.perf_counter() - started:.3f}s")
+    return {
+        "best": candidate,
+        "candidates": [candidate],
+        "pruned": pruned,
+        "skipped": coarse["skipped"],
+        "best_angle": angle
     }
+
+
+def _strategy_pool(workers):
+    """
+    Process pool evaluating strategies, kept for the life of the process.
+
+    Workers keep the grid they last attached to, with its search engines, and
+    the connector cache across tasks, so strategies of one plan and replans of
+    an unchanged grid reuse them. A pool of a different size is replaced.
+    """
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is not None and _pool_workers != workers:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=workers)
+            _pool_workers = workers
+            # A multiprocessing child (e.g. a plan job worker) joins its
+            # children at exit before the executor's own exit hook runs, so
+            # stop the pool first, ahead of the queue finalizers (priority 10)
+            multiprocessing.util.Finalize(_pool, _pool.shutdown, exitpriority=100)
+        return _pool
+
+
+def _discard_pool(pool):
+    """Drop pool, broken by a dead worker, so the next plan starts a new one."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _evaluate_parallel(grid, tasks, connector, workers, ordering_iterations, deadline=None):
+    """
+    Evaluate strategies in the strategy pool reading one shared-memory grid.
+
+    Workers abandon their strategies at the deadline themselves, except for
+    the first task, which always completes so there is a plan to return.
+
+    Returns:
+        Tuple of (candidates in task order, names of strategies still
+        unfinished at the deadline)
+    """
+    grid = np.ascontiguousarray(grid, dtype=np.uint8)
+    fingerprint = grid_fingerprint(grid)
+    # perf_counter() values do not compare across processes, so workers get the wall-clock time
+    expires_at = time.time() + (deadline - time.perf_counter()) if deadline is not None else None
+    shm = shared_memory.SharedMemory(create=True, size=max(grid.nbytes, 1))
+    pool = _strategy_pool(workers)
+    futures = []
+    try:
+        shared = np.ndarray(grid.shape, dtype=np.uint8, buffer=shm.buf)
+        shared[:] = grid
+        del shared
+
+        def submit_all():
+            return [
+                pool.submit(_evaluate_shared, shm.name, grid.shape, fingerprint, name, angle, connector,
+                            ordering_iterations, expires_at if i else None)
+                for i, (name, angle) in enumerate(tasks)
+            ]
+
+        try:
+            futures = submit_all()
+        except BrokenProcessPool:
+            # A worker died since the last plan; start over on a new pool
+            _discard_pool(pool)
+            pool = _strategy_pool(workers)
+            futures = submit_all()
+        if deadline is None:
+            wait(futures)
+        else:
+            wait(futures, timeout=max(deadline - time.perf_counter(), 0))
+            results = [future.result() for future in futures if future.done()]
+            if not any("path" in result for result in results):
+                # Keep the first strategy, which ignores the deadline, so there is a plan to return
+                wait(futures[:1])
+
+        candidates, skipped = [], []
+        for (name, _), future in zip(tasks, futures):
+            result = future.result() if future.done() else None
+            if result is not None:
+                # Lookups hit the worker's cache; count them here, where plans are reported
+                connector_cache.record(*result.pop("lookups"))
+            if result is None or result.get("reason") == "deadline":
+                skipped.append(name)
+            else:
+                candidates.append(result)
+        return candidates, skipped
+    except BrokenProcessPool:
+        _discard_pool(pool)
+        raise
+    finally:
+        # Strategies that never started are dropped; running ones are left to
+        # finish in the background, their workers keep the block mapped
+        for future in futures:
+            future.cancel()
+        shm.close()
+        shm.unlink()
+
+
+def _evaluate_shared(shm_name, shape, fingerprint, name, angle, connector, ordering_iterations, expires_at=None):
+    """
+    Strategy pool task evaluating one strategy on the shared grid.
+
+    The strategy is abandoned once time.time() passes expires_at. The result
+    carries the (hits, misses) of this worker's connector cache as lookups.
+    """
+    deadline = time.perf_counter() + (expires_at - time.time()) if expires_at is not None else None
+    if deadline is not None and time.perf_counter() > deadline:
+        return {"strategy": name, "reason": "deadline", "bound": None, "lookups": (0, 0)}
+    hits, misses = connector_cache.lookups()
+    grid, searches = _attach_grid(shm_name, shape, fingerprint)
+    if connector not in searches:
+        searches[connector] = make_search(grid, connector, fingerprint)
+    segments = sweep.angle_sweeps(grid, [angle])[angle] if angle is not None else None
+    result = evaluate_strategy(grid, name, searches[connector], segments=segments,
+                               ordering_iterations=ordering_iterations, deadline=deadline)
+    if angle is not None:
+        result["angle"] = angle
+    after = connector_cache.lookups()
+    result["lookups"] = (after[0] - hits, after[1] - misses)
+    return result
+
+
+def _attach_grid(shm_name, shape, fingerprint):
+    """
+    Read-only view of the shared grid and its search engines by connector.
+
+    A worker attaches to each grid once and keeps it until a task for
+    another grid arrives, so its search engines are built once per grid.
+    """
+    key = (shm_name, shape, fingerprint)
+    if _worker_grid.get("key") != key:
+        _release_grid()
+        shm = shared_memory.SharedMemory(name=shm_name)
+        grid = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+        grid.flags.writeable = False
+        _worker_grid.update(key=key, shm=shm, grid=grid, searches={})
+    return _worker_grid["grid"], _worker_grid["searches"]
+
+
+def _release_grid():
+    shm = _worker_grid.get("shm")
+    _worker_grid.clear()
+    if shm is not None:
+        try:
+            shm.close()
+        except BufferError:
+            # Something still views the block; it is unmapped once that is freed
+            pass
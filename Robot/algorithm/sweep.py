@@ -1,10 +1,151 @@
-
 """Module for sweep algorithms used in robot path planning."""
 import logging
+from typing import NamedTuple
+import numpy as np
+from algorithm.path import line_cells
 
 logger = logging.getLogger(__name__)
 
 
+class Segment(NamedTuple):
+    """A run of free cells along one grid row or column, in travel order."""
+    line: int       # Row index for horizontal segments, column index for vertical ones
+    start: int      # First cell along the line
+    end: int        # Last cell along the line (inclusive)
+    direction: int  # +1 when travelling towards higher indices, -1 otherwise
+    axis: int = 0   # 0 for a horizontal (row) segment, 1 for a vertical (column) one
+
+    @property
+    def length(self):
+        """Number of cells in the segment."""
+        return abs(self.end - self.start) + 1
+
+    @property
+    def first(self):
+        """Grid cell the segment starts at."""
+        return self._cell(self.start)
+
+    @property
+    def last(self):
+        """Grid cell the segment ends at."""
+        return self._cell(self.end)
+
+    def cells(self):
+        """Expand the segment into its (N, 2) array of (r, c) cells in travel order."""
+        return line_cells(self.line, self.start, self.end, self.axis)
+
+    def reversed(self):
+        """The same segment travelled the other way."""
+        return self._replace(start=self.end, end=self.start, direction=-self.direction)
+
+    def _cell(self, i):
+        return (self.line, i) if self.axis == 0 else (i, self.line)
+
+
+class BoustrophedonCell(NamedTuple):
+    """
+    An obstacle-free cell of a boustrophedon decomposition.
+
+    The cell is one run per consecutive line, swept as a single lawnmower
+    pattern. Each pair of overlapping runs is joined by a Manhattan link
+    through free cells of either run, so the cell never needs a connector
+    search.
+    """
+    runs: tuple     # (line, first, last) per consecutive line, top to bottom
+    axis: int = 0   # 0 when lines are rows, 1 when they are columns
+    reverse: bool = False  # Travel the sweep from its last cell back to its first
+
+    @property
+    def length(self):
+        """Number of cells in the swept path, including the links between runs."""
+        ends = self._ends()
+        total = sum(last - first + 1 for _, first, last in self.runs)
+        return total + sum(abs(ends[i][1] - ends[i + 1][0]) for i in range(len(ends) - 1))
+
+    @property
+    def first(self):
+        """Grid cell the sweep starts at."""
+        return self._tail() if self.reverse else self._head()
+
+    @property
+    def last(self):
+        """Grid cell the sweep ends at."""
+        return self._head() if self.reverse else self._tail()
+
+    def cells(self):
+        """Expand the lawnmower sweep into its (N, 2) array of (r, c) cells."""
+        path = self._forward_cells()
+        return path[::-1] if self.reverse else path
+
+    def reversed(self):
+        """The same sweep travelled the other way."""
+        return self._replace(reverse=not self.reverse)
+
+    def _head(self):
+        return self._cell(self.runs[0][0], self.runs[0][1])
+
+    def _tail(self):
+        return self._cell(self.runs[-1][0], self._ends()[-1][1])
+
+    def _forward_cells(self):
+        pieces = []
+        ends = self._ends()
+        for i, (line, first, last) in enumerate(self.runs):
+            start, end = ends[i]
+            pieces.append(line_cells(line, start, end, self.axis))
+
+            if i + 1 < len(self.runs):
+                nxt = ends[i + 1][0]
+                if nxt == end:
+                    continue
+                step = 1 if nxt > end else -1
+                if first <= nxt <= last:
+                    # Along this run, then down onto the next one
+                    pieces.append(line_cells(line, end + step, nxt, self.axis))
+                else:
+                    # Down first, then along the next run up to its start
+                    pieces.append(line_cells(line + 1, end, nxt - step, self.axis))
+        return np.concatenate(pieces)
+
+    def _ends(self):
+        """(start, end) index of every run, alternating the travel direction."""
+        return [
+            (first, last) if i % 2 == 0 else (last, first)
+            for i, (_, first, last) in enumerate(self.runs)
+        ]
+
+    def _cell(self, line, i):
+        return (line, i) if self.axis == 0 else (i, line)
+
+
+class CellRun(NamedTuple):
+    """A connected run of cells along one band of an angled sweep, in travel order."""
+    path: np.ndarray  # (N, 2) array of (r, c) cells, each 4-adjacent to the next
+
+    @property
+    def length(self):
+        """Number of cells in the run."""
+        return len(self.path)
+
+    @property
+    def first(self):
+        """Grid cell the run starts at."""
+        return (int(self.path[0, 0]), int(self.path[0, 1]))
+
+    @property
+    def last(self):
+        """Grid cell the run ends at."""
+        return (int(self.path[-1, 0]), int(self.path[-1, 1]))
+
+    def cells(self):
+        """The run's (N, 2) array of (r, c) cells."""
+        return self.path
+
+    def reversed(self):
+        """The same run travelled the other way."""
+        return CellRun(self.path[::-1])
+
+
 class Sweep():
     """Implements horizontal and vertical sweep algorithms for grid traversal."""
     def __init__(self, robot):
@@ -15,53 +156,167 @@ class Sweep():
         """Perform a horizontal sweep across the grid in alternating directions."""
         h, w = grid.shape
         logger.debug(f"Sweep: Starting horizontal sweep on {h}x{w} grid")
-        segments = []
-        ltr = True
+        return self._serpentine(*self.free_runs(grid), axis=0)
 
-        for r in range(h):
-            cols = range(w) if ltr else range(w - 1, -1, -1)
-            current = []
-
-            for c in cols:
-                if grid[r, c] == 0:
-                    current.append((r, c))
-                else:
-                    if current:
-                        segments.append(current)
-                        current = []
+    def vertical_sweep(self, grid):
+        """Perform a vertical sweep down the grid in alternating directions."""
+        h, w = grid.shape
+        logger.debug(f"Sweep: Starting vertical sweep on {h}x{w} grid")
+        return self._serpentine(*self.free_runs(grid.T), axis=1)
 
-            if current:
-                segments.append(current)
+    def angle_sweeps(self, grid, angles):
+        """
+        Sweep the grid along several angles, each one vectorized.
 
-            ltr = not ltr
+        Free cells are projected onto each sweep direction instead of
+        rotating the geometry: the rounded normal coordinate selects the band
+        and the coordinate along the direction orders cells within it. Bands
+        alternate their travel direction. Consecutive cells of a band that
+        touch diagonally are joined through a free corner cell. Any other gap
+        starts a new run. Angles are swept one after the other, so working
+        memory stays proportional to the free cells whatever their number.
 
-        return segments
+        Args:
+            grid: 2D array with 0 for free cells
+            angles: Sweep angles in degrees, 0 being horizontal
 
-    def vertical_sweep(self, grid):
-        """Perform a vertical sweep down the grid in alternating directions."""
+        Returns:
+            Dict mapping each angle to its list of CellRun in travel order
+        """
         h, w = grid.shape
-        logger.debug(f"Sweep: Starting vertical sweep on {h}x{w} grid")
-        segments = []
-        ttb = True
+        free = np.argwhere(grid == 0)
+        angles = list(dict.fromkeys(float(a) for a in angles))
+        logger.debug(f"Sweep: Starting {len(angles)} angled sweeps on {h}x{w} grid")
+        if not free.size:
+            return {angle: [] for angle in angles}
 
-        for c in range(w):
-            rows = range(h) if ttb else range(h - 1, -1, -1)
-            current = []
+        rows, cols = free[:, 0].astype(np.float64), free[:, 1].astype(np.float64)
+        return {angle: self._angle_runs(grid, free, rows, cols, angle) for angle in angles}
 
-            for r in rows:
-                if grid[r, c] == 0:
-                    current.append((r, c))
+    @staticmethod
+    def _angle_runs(grid, free, rows, cols, angle):
+        theta = np.deg2rad(angle)
+        # Rounded to a few decimals so axis-aligned angles are free of cos/sin noise
+        bands = np.floor(np.round(rows * np.cos(theta) - cols * np.sin(theta), 9) + 0.5).astype(np.int64)
+        along = np.round(cols * np.cos(theta) + rows * np.sin(theta), 9)
+        along = np.where(bands % 2 == 0, along, -along)
+
+        order = np.lexsort((along, bands))
+        cells = free[order]
+        bands = bands[order]
+
+        step = np.abs(np.diff(cells, axis=0))
+        same_band = bands[1:] == bands[:-1]
+        unit = step.sum(axis=1) == 1
+        diagonal = (step[:, 0] == 1) & (step[:, 1] == 1)
+        across = grid[cells[:-1, 0], cells[1:, 1]] == 0   # corner in the current row
+        down = grid[cells[1:, 0], cells[:-1, 1]] == 0     # corner in the next row
+        cornered = same_band & diagonal & (across | down)
+        linked = same_band & (unit | cornered)
+
+        run_id = np.concatenate(([0], np.cumsum(~linked)))
+        at = np.flatnonzero(cornered)
+        corners = np.where(across[at, None],
+                           np.stack([cells[at, 0], cells[at + 1, 1]], axis=1),
+                           np.stack([cells[at + 1, 0], cells[at, 1]], axis=1))
+        cells = np.insert(cells, at + 1, corners, axis=0)
+        run_id = np.insert(run_id, at + 1, run_id[at])
+
+        bounds = np.flatnonzero(np.diff(run_id)) + 1
+        return [CellRun(run) for run in np.split(cells, bounds)]
+
+    def boustrophedon(self, grid):
+        """
+        Decompose the free space into boustrophedon cells, ordered for travel.
+
+        Runs of consecutive rows belong to the same cell while they overlap
+        one-to-one. A cell ends wherever an obstacle splits or merges runs.
+        Cells are visited depth-first over their adjacency, so each connector
+        usually joins neighbouring cells.
+        """
+        h, w = grid.shape
+        lines, firsts, lasts = self.free_runs(grid)
+        lines, firsts, lasts = lines.tolist(), firsts.tolist(), lasts.tolist()
+        row_start = np.searchsorted(lines, np.arange(h + 1)).tolist()
+
+        # Overlapping runs between consecutive rows
+        up = [[] for _ in lines]
+        down = [[] for _ in lines]
+        for r in range(1, h):
+            i, i_end = row_start[r - 1], row_start[r]
+            j, j_end = row_start[r], row_start[r + 1]
+            while i < i_end and j < j_end:
+                if lasts[i] >= firsts[j] and lasts[j] >= firsts[i]:
+                    down[i].append(j)
+                    up[j].append(i)
+                if lasts[i] < lasts[j]:
+                    i += 1
                 else:
-                    if current:
-                        segments.append(current)
-                        current = []
+                    j += 1
+
+        cell_of = [0] * len(lines)
+        cell_runs = []
+        for j in range(len(lines)):
+            if len(up[j]) == 1 and len(down[up[j][0]]) == 1:
+                cell_of[j] = cell_of[up[j][0]]
+            else:
+                cell_of[j] = len(cell_runs)
+                cell_runs.append([])
+            cell_runs[cell_of[j]].append((lines[j], firsts[j], lasts[j]))
+
+        adjacency = [set() for _ in cell_runs]
+        for j in range(len(lines)):
+            for i in up[j]:
+                if cell_of[i] != cell_of[j]:
+                    adjacency[cell_of[i]].add(cell_of[j])
+                    adjacency[cell_of[j]].add(cell_of[i])
 
-            if current:
-                segments.append(current)
+        # Depth-first preorder over the cell adjacency graph
+        order = []
+        seen = [False] * len(cell_runs)
+        for root in range(len(cell_runs)):
+            stack = [root]
+            while stack:
+                cell = stack.pop()
+                if seen[cell]:
+                    continue
+                seen[cell] = True
+                order.append(cell)
+                stack.extend(sorted(adjacency[cell], reverse=True))
 
-            ttb = not ttb
+        logger.debug(f"Sweep: Boustrophedon decomposition of {h}x{w} grid into "
+                     f"{len(cell_runs)} cells from {len(lines)} runs")
+        return [BoustrophedonCell(tuple(cell_runs[cell])) for cell in order]
+
+    @staticmethod
+    def free_runs(grid):
+        """
+        Detect the runs of free cells along every row of grid.
+
+        Returns:
+            Arrays (lines, firsts, lasts) in row-major order, with inclusive
+            first and last column indices
+        """
+        h, w = grid.shape
+        padded = np.zeros((h, w + 2), dtype=np.int8)
+        padded[:, 1:-1] = grid == 0
+        edges = np.diff(padded, axis=1)
 
-        return segments
+        lines, firsts = np.nonzero(edges == 1)
+        _, stops = np.nonzero(edges == -1)
+        return lines, firsts, stops - 1
 
+    @staticmethod
+    def _serpentine(lines, firsts, lasts, axis):
+        """Order runs line by line, alternating the travel direction per line."""
+        directions = np.where(lines % 2 == 0, 1, -1)
+        order = np.lexsort((firsts * directions, lines))
 
-    
\ No newline at end of file
+        starts = np.where(directions > 0, firsts, lasts)[order]
+        ends = np.where(directions > 0, lasts, firsts)[order]
+        return [
+            Segment(line, start, end, direction, axis)
+            for line, start, end, direction in zip(
+                lines[order].tolist(), starts.tolist(), ends.tolist(), directions[order].tolist()
+            )
+        ]
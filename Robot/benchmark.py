@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Planner benchmark script.
+Times the planning building blocks on synthetic walls and checks that the
+optimized code paths agree with the reference implementations.
+"""
+import argparse
+import logging
+import time
+
+import numpy as np
+from shapely.geometry import Polygon, box
+
+from algorithm import planner
+from algorithm.algorithms import Algorithms, GridSearch, JumpPointSearch
+from algorithm.grid_construction import Grid
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def timed(fn, *args, repeat=1, **kwargs):
+    """Run fn repeat times and return (best seconds, last result)."""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def sample_wall(width, height, obstacle_count=3, shape="rect"):
+    """Build a wall of the given shape with a row of window-sized obstacles."""
+    wall = box(0, 0, width, height)
+    if shape == "concave":
+        # L-shaped facade with a slanted roof edge
+        wall = Polygon([(0, 0), (width, 0), (width, height * 0.6),
+                        (width * 0.5, height * 0.45), (width * 0.5, height), (0, height)])
+    elif shape == "holed":
+        # Wall with a diamond-shaped cut-out that is not part of the wall
+        cx, cy = width * 0.5, height * 0.5
+        hole = [(cx - height * 0.2, cy), (cx, cy - height * 0.2), (cx + height * 0.2, cy), (cx, cy + height * 0.2)]
+        wall = Polygon(wall.exterior.coords, [hole])
+
+    obstacles = []
+    step = width / (obstacle_count + 1)
+    for i in range(obstacle_count):
+        cx = step * (i + 1)
+        obstacles.append(box(cx - step / 4, height * 0.3, cx + step / 4, height * 0.7))
+    return wall, obstacles
+
+
+def scattered_obstacles(width, height, count, size=0.08):
+    """Spread count small square obstacles (outlets, brackets) over the wall."""
+    cols = max(1, int((count * width / height) ** 0.5))
+    rows = -(-count // cols)
+    obstacles = []
+    for i in range(count):
+        cx = width * ((i % cols) + 0.5) / cols
+        cy = height * ((i // cols) + 0.5) / rows
+        obstacles.append(box(cx - size / 2, cy - size / 2, cx + size / 2, cy + size / 2))
+    return obstacles
+
+
+def bench_grid(args):
+    """Compare grid rasterization backends."""
+    wall, obstacles = sample_wall(args.width, args.height, args.obstacles, args.shape)
+    builder = Grid()
+    reference = None
+
+    for backend in args.backends:
+        seconds, grid = timed(builder.build_grid, wall, obstacles, args.resolution,
+                              backend=backend, workers=args.workers, repeat=args.repeat)
+        if reference is None:
+            reference = grid
+        identical = grid.shape == reference.shape and grid.tobytes() == reference.tobytes()
+        logger.info(f"grid backend={backend:<10} workers={args.workers} shape={grid.shape} "
+                    f"time={seconds:.4f}s identical={identical}")
+
+
+def bench_obstacles(args):
+    """Measure how rasterization scales with the number of obstacles."""
+    wall = box(0, 0, args.width, args.height)
+    builder = Grid()
+
+    for count in args.counts:
+        obstacles = scattered_obstacles(args.width, args.height, count)
+        reference = None
+        for backend in args.backends:
+            seconds, grid = timed(builder.build_grid, wall, obstacles, args.resolution,
+                                  backend=backend, repeat=args.repeat)
+            if reference is None:
+                reference = grid
+            identical = grid.tobytes() == reference.tobytes()
+            logger.info(f"obstacles={count:<5} backend={backend:<10} shape={grid.shape} "
+                        f"time={seconds:.4f}s identical={identical}")
+
+
+def bench_astar(args):
+    """Compare the dict-based A* with the GridSearch and JumpPointSearch engines."""
+    wall = box(0, 0, args.width, args.height)
+    obstacles = scattered_obstacles(args.width, args.height, args.obstacles, size=0.5)
+    grid = Grid().build_grid(wall, obstacles, args.resolution)
+
+    rng = np.random.default_rng(args.seed)
+    free = np.argwhere(grid == 0)
+    pairs = [
+        (tuple(map(int, free[a])), tuple(map(int, free[b])))
+        for a, b in rng.integers(len(free), size=(args.queries, 2))
+    ]
+
+    algorithms = Algorithms()
+    legacy_seconds, legacy_paths = timed(lambda: [algorithms.astar(grid, s, g) for s, g in pairs])
+    logger.info(f"astar grid={grid.shape} queries={len(pairs)} legacy={legacy_seconds:.4f}s")
+
+    for engine in (GridSearch, JumpPointSearch):
+        setup_seconds, search = timed(engine, grid)
+        engine_seconds, engine_paths = timed(lambda: [search.search(s, g) for s, g in pairs])
+        same_lengths = [len(p) for p in legacy_paths] == [len(p) for p in engine_paths]
+        logger.info(f"astar {engine.__name__}={engine_seconds:.4f}s (+{setup_seconds:.4f}s setup) "
+                    f"expansions={search.expansions} same_lengths={same_lengths}")
+
+
+def bench_strategies(args):
+    """Compare sequential and pooled strategy evaluation in planner.plan."""
+    wall, obstacles = sample_wall(args.width, args.height, args.obstacles, args.shape)
+    grid = Grid().build_grid(wall, obstacles, args.resolution)
+    coarse_grid = coarse_scale = None
+    if args.coarse_resolution:
+        coarse_grid = Grid().build_grid(wall, obstacles, args.coarse_resolution)
+        coarse_scale = args.coarse_resolution / args.resolution
+    reference = None
+
+    for workers in args.workers:
+        planner.connector_cache.clear()
+        seconds, result = timed(planner.plan, grid, connector=args.connector, workers=workers,
+                                sweep_angles=args.angles, ordering_iterations=args.ordering_iterations,
+                                time_budget=args.deadline_ms / 1000 if args.deadline_ms else None,
+                                coarse_grid=coarse_grid, coarse_scale=coarse_scale)
+        if reference is None:
+            reference = result
+        # Pooled evaluation runs every strategy, so only the winner has to match
+        same_best = np.array_equal(result["best"]["path"], reference["best"]["path"])
+        logger.info(f"strategies grid={grid.shape} workers={workers} time={seconds:.4f}s "
+                    f"pruned={[p['strategy'] for p in result['pruned']]} skipped={result['skipped']} "
+                    f"best={result['best']['strategy']} best_angle={result['best_angle']} "
+                    f"coverage={result['best']['metrics']['coverage']} "
+                    f"path_length={result['best']['metrics']['path_length']} "
+                    f"path_bytes={result['best']['path'].nbytes} "
+                    f"same_best={same_best}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Planner benchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    grid_parser = subparsers.add_parser("grid", help="Compare grid rasterization backends")
+    grid_parser.add_argument("--width", type=float, default=20.0)
+    grid_parser.add_argument("--height", type=float, default=5.0)
+    grid_parser.add_argument("--resolution", type=float, default=0.1)
+    grid_parser.add_argument("--obstacles", type=int, default=3)
+    grid_parser.add_argument("--shape", choices=["rect", "concave", "holed"], default="rect")
+    grid_parser.add_argument("--workers", type=int, default=1, help="Processes for tiled builds (0 = all cores)")
+    grid_parser.add_argument("--repeat", type=int, default=3)
+    grid_parser.add_argument("--backends", nargs="+", default=["pointwise", "vectorized", "scanline"],
+                             choices=Grid.BACKENDS)
+    grid_parser.set_defaults(func=bench_grid)
+
+    obstacles_parser = subparsers.add_parser("obstacles", help="Scale the obstacle count per wall")
+    obstacles_parser.add_argument("--width", type=float, default=20.0)
+    obstacles_parser.add_argument("--height", type=float, default=5.0)
+    obstacles_parser.add_argument("--resolution", type=float, default=0.02)
+    obstacles_parser.add_argument("--counts", type=int, nargs="+", default=[1, 10, 100, 300, 1000])
+    obstacles_parser.add_argument("--repeat", type=int, default=3)
+    obstacles_parser.add_argument("--backends", nargs="+", default=["vectorized", "scanline"],
+                                  choices=Grid.BACKENDS)
+    obstacles_parser.set_defaults(func=bench_obstacles)
+
+    astar_parser = subparsers.add_parser("astar", help="Compare A* implementations on random connectors")
+    astar_parser.add_argument("--width", type=float, default=20.0)
+    astar_parser.add_argument("--height", type=float, default=5.0)
+    astar_parser.add_argument("--resolution", type=float, default=0.05)
+    astar_parser.add_argument("--obstacles", type=int, default=30)
+    astar_parser.add_argument("--queries", type=int, default=200)
+    astar_parser.add_argument("--seed", type=int, default=0)
+    astar_parser.set_defaults(func=bench_astar)
+
+    strategies_parser = subparsers.add_parser("strategies", help="Time sequential vs parallel strategies")
+    strategies_parser.add_argument("--width", type=float, default=20.0)
+    strategies_parser.add_argument("--height", type=float, default=5.0)
+    strategies_parser.add_argument("--resolution", type=float, default=0.05)
+    strategies_parser.add_argument("--obstacles", type=int, default=3)
+    strategies_parser.add_argument("--shape", choices=["rect", "concave", "holed"], default="rect")
+    strategies_parser.add_argument("--connector", choices=list(planner.CONNECTORS), default="astar")
+    strategies_parser.add_argument("--workers", type=int, nargs="+", default=[1, 2])
+    strategies_parser.add_argument("--ordering-iterations", type=int, default=0, help="Segment ordering iterations per free region")
+    strategies_parser.add_argument("--deadline-ms", type=float, default=0, help="Plan time budget (0 = none)")
+    strategies_parser.add_argument("--angles", type=float, nargs="*", default=[], help="Extra sweep angles in degrees")
+    strategies_parser.add_argument("--coarse-resolution", type=float, default=0,
+                                   help="Plan on this coarser grid first and refine its best strategy (0 = off)")
+    strategies_parser.set_defaults(func=bench_strategies)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,41 @@
 import logging
+from typing import Literal
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from database import get_db
 from repositories import PathRepository, ExecutionRepository
+from services.planner_service import PlannerService
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/paths", tags=["execution"])
 
 
+@router.get("/{path_id}")
+async def get_path(path_id: str, form: Literal["waypoints", "cells"] = "waypoints",
+                   db: Session = Depends(get_db)):
+    """Get a path as turn-point polylines (default) or as every grid cell."""
+    path_repo = PathRepository(db)
+    path = path_repo.get_path(path_id)
+    if not path:
+        raise HTTPException(status_code=404, detail="Path not found")
+
+    response = {
+        "path_id": path.id,
+        "plan_id": path.plan_id,
+        "strategy": path.strategy,
+        "coverage": path.coverage,
+        "path_length": path.path_length,
+        "execution_status": path.execution_status,
+        "form": form
+    }
+    if form == "cells":
+        response["cells"] = PlannerService.path_cells(path)
+    else:
+        response["waypoints"] = PlannerService.path_waypoints(path)
+    return response
+
+
 @router.post("/{path_id}/execute")
 async def execute_path(path_id: str, db: Session = Depends(get_db)):
     """Execute a path on the robot."""
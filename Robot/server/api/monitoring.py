@@ -3,6 +3,10 @@ from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 from database import get_db
 import db_models
+from services.planner_service import PlannerService
+from services.plan_jobs import plan_jobs
+from repositories import PlanCacheRepository
+from config import PLAN_QUEUE, PLAN_CACHE_MB
 
 logger = logging.getLogger(__name__)
 
@@ -27,5 +31,13 @@ async def get_stats(db: Session = Depends(get_db)):
         "total_plans": len(all_plans),
         "total_paths": len(all_paths),
         "total_executions": len(all_executions),
-        "active_executions": len([e for e in all_executions if e.status == "RUNNING"])
+        "active_executions": len([e for e in all_executions if e.status == "RUNNING"]),
+        "connector_cache": PlannerService.connector_cache_stats(all_plans),
+        "plan_queue": {
+            **plan_jobs.stats(),
+            "mode": PLAN_QUEUE,
+            "pending": len([p for p in all_plans if p.status == "PENDING"]),
+            "running": len([p for p in all_plans if p.status == "RUNNING"])
+        },
+        "plan_cache": {**PlanCacheRepository(db).stats(), "max_bytes": PLAN_CACHE_MB * 1024 * 1024}
     }
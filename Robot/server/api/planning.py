@@ -1,8 +1,13 @@
 import logging
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from models import PlanRequest, PlanResponse, PlanCandidate
-from services.planner_service import PlannerService
+from models import PlanRequest, PlanResponse, PlanCandidate, PrunedCandidate, PlanJobResponse
+from services.planner_service import PlannerService, GridSizeError
+from services.plan_jobs import plan_jobs, QueueFullError
+from services.fingerprint import geometry_fingerprint, request_key
+from config import PLAN_QUEUE, PLAN_QUEUE_DEPTH
 from database import get_db
 from repositories import WallRepository, ObstacleRepository, PlanRepository
 
@@ -10,10 +15,13 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/walls", tags=["planning"])
 
+# Times a plan request looks up or creates its plan before giving up on conflicts
+COALESCE_ATTEMPTS = 3
 
-@router.post("/{wall_id}/plan", response_model=PlanResponse)
+
+@router.post("/{wall_id}/plan", response_model=PlanJobResponse, status_code=202)
 async def plan_wall(wall_id: str, req: PlanRequest, db: Session = Depends(get_db)):
-    """Generate a coverage plan for a wall."""
+    """Queue a coverage plan for a wall; poll GET /walls/plans/{plan_id} for the result."""
     logger.info(f"API: Planning wall {wall_id} with resolution {req.resolution}")
     # Fetch wall from DB
     wall_repo = WallRepository(db)
@@ -30,28 +38,91 @@ async def plan_wall(wall_id: str, req: PlanRequest, db: Session = Depends(get_db
     wall_data = {"id": wall.id, "geometry": wall.geometry}
     obstacles_data = [{"geometry": o.geometry} for o in obstacles]
     
-    # Run planning
-    planner = PlannerService(db=db)
-    plan_id, candidates = await planner.run_plan(wall_data, obstacles_data, req.resolution)
+    try:
+        PlannerService.check_grid_size(wall_data, req.resolution)
+    except GridSizeError as e:
+        logger.warning(f"API: Plan rejected for wall {wall_id}: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    options = {
+        "connector": req.connector,
+        "sweep_angles": req.sweep_angles,
+        "deadline_ms": req.deadline_ms,
+        "coarse_resolution": req.coarse_resolution
+    }
+    key = request_key(wall.id, geometry_fingerprint(wall.geometry, [o.geometry for o in obstacles]),
+                      req.resolution, options)
+    plan_repo = PlanRepository(db)
+    
+    # The plans table allows one in-flight plan per request key, so a request
+    # racing an identical one in another process loses the insert and joins
+    for _ in range(COALESCE_ATTEMPTS):
+        # Identical requests share the plan already computing their result
+        in_flight = plan_repo.get_in_flight_plan(key)
+        if in_flight and _is_live(plan_repo, in_flight):
+            logger.info(f"API: Coalesced plan request for wall {wall_id} into plan {in_flight.id}")
+            plan_jobs.record_coalesced()
+            return PlanJobResponse(plan_id=in_flight.id, status=in_flight.status, coalesced=True)
+        if in_flight:
+            logger.warning(f"API: Plan {in_flight.id} was orphaned, planning request for wall {wall_id} anew")
+            plan_repo.fail_orphaned_plans("Orphaned: no worker is running the plan", in_flight.id,
+                                          lease_expired=PLAN_QUEUE == "database")
+            continue
+        
+        try:
+            # Cloning copies every cached path, so it runs off the event loop
+            cached = await run_in_threadpool(PlannerService(db).cached_plan, wall_data, obstacles_data,
+                                             req.resolution, options, key)
+            if cached:
+                return PlanJobResponse(plan_id=cached.id, status=cached.status, cached=True)
+            
+            if PLAN_QUEUE == "database":
+                # Queue workers (worker.py) claim the plan from the plans table
+                pending = plan_repo.count_plans("PENDING")
+                if pending >= PLAN_QUEUE_DEPTH:
+                    logger.warning(f"API: Plan rejected for wall {wall_id}: {pending} plans pending")
+                    raise HTTPException(status_code=503, detail=f"Plan queue is full ({pending} plans pending)")
+                plan = plan_repo.create_plan(wall_id, req.resolution, options, key)
+                return PlanJobResponse(plan_id=plan.id, status=plan.status)
+            
+            plan = plan_repo.create_plan(wall_id, req.resolution, options, key)
+        except IntegrityError:
+            # An identical request created its plan first
+            db.rollback()
+            continue
+        break
+    else:
+        raise HTTPException(status_code=503, detail="Plan request conflicted with identical requests, retry")
     
-    # Convert candidates to response format
-    candidate_responses = []
-    best_path_id = None
-    for i, c in enumerate(candidates):
-        candidate_responses.append(
-            PlanCandidate(
-                path_id=c["path_id"],
-                coverage=c["coverage"],
-                path_length=c["path_length"]
-            )
-        )
-        if i == 0:  # First candidate is best
-            best_path_id = c["path_id"]
+    # Queue planning for a worker process of this server
+    try:
+        plan_jobs.submit(plan.id, wall_data, obstacles_data, req.resolution, **options)
+    except QueueFullError as e:
+        logger.warning(f"API: Plan rejected for wall {wall_id}: {e}")
+        plan_repo.delete_plan(plan.id)
+        raise HTTPException(status_code=503, detail=str(e))
     
+    return PlanJobResponse(plan_id=plan.id, status=plan.status)
+
+
+def _is_live(plan_repo, plan):
+    """Whether an in-flight plan is still going to finish."""
+    if PLAN_QUEUE == "database":
+        # PENDING plans wait for a worker; a RUNNING plan's worker must keep renewing its lease
+        return not plan_repo.lease_expired(plan.id)
+    # Local plans run in this process's pool; others were left behind by a previous process
+    return plan_jobs.holds(plan.id)
+
+
+def _plan_response(summary, best_path_id):
+    """Convert a completed plan's stored summary to the response format."""
     return PlanResponse(
-        plan_id=plan_id,
+        plan_id=summary["plan_id"],
         best_path_id=best_path_id,
-        candidates=candidate_responses
+        candidates=[PlanCandidate(**c) for c in summary["candidates"]],
+        pruned=[PrunedCandidate(**p) for p in summary["pruned"]],
+        skipped=summary["skipped"],
+        best_angle=summary["best_angle"]
     )
 
 
@@ -89,6 +160,11 @@ async def get_plan_details(plan_id: str, db: Session = Depends(get_db)):
         "status": plan.status,
         "best_path_id": plan.best_path_id,
         "created_at": plan.created_at,
+        "completed_at": plan.completed_at,
+        "attempts": plan.attempts,
+        "lease_owner": plan.lease_owner,
+        "error": plan.error,
+        "result": _plan_response(plan.summary, plan.best_path_id) if plan.summary else None,
         "paths": [
             {
                 "path_id": p.id,
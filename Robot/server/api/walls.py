@@ -3,7 +3,8 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from models import CreateWallRequest, CreateObstacleRequest, WallResponse
 from database import get_db
-from repositories import WallRepository, ObstacleRepository, GridRepository
+from repositories import WallRepository, ObstacleRepository
+from services.planner_service import PlannerService
 
 logger = logging.getLogger(__name__)
 
@@ -84,13 +85,34 @@ async def create_obstacle(wall_id: str, req: CreateObstacleRequest, db: Session
         geometry=req.geometry.coordinates
     )
     
-    # Invalidate grid cache
-    grid_repo = GridRepository(db)
-    grid_repo.invalidate_grid(wall_id)
+    # Patch the obstacle's window in every cached grid
+    _patch_grid_cache(db, wall, obstacle_repo, obstacle.geometry)
     
     return {"status": "created", "obstacle_id": obstacle.id}
 
 
+@router.delete("/{wall_id}/obstacles/{obstacle_id}")
+async def delete_obstacle(wall_id: str, obstacle_id: str, db: Session = Depends(get_db)):
+    """Delete an obstacle from a wall."""
+    wall_repo = WallRepository(db)
+    wall = wall_repo.get_wall(wall_id)
+    if not wall:
+        raise HTTPException(status_code=404, detail="Wall not found")
+    
+    obstacle_repo = ObstacleRepository(db)
+    obstacle = obstacle_repo.get_obstacle(obstacle_id)
+    if not obstacle or obstacle.wall_id != wall_id:
+        raise HTTPException(status_code=404, detail="Obstacle not found")
+    
+    geometry = obstacle.geometry
+    obstacle_repo.delete_obstacle(obstacle_id)
+    
+    # Re-rasterize the freed window against the remaining obstacles
+    _patch_grid_cache(db, wall, obstacle_repo, geometry)
+    
+    return {"status": "deleted"}
+
+
 @router.get("/{wall_id}/obstacles")
 async def get_obstacles(wall_id: str, db: Session = Depends(get_db)):
     """Get all obstacles for a wall."""
@@ -107,3 +129,10 @@ async def get_obstacles(wall_id: str, db: Session = Depends(get_db)):
             for o in obstacles
         ]
     }
+
+
+def _patch_grid_cache(db: Session, wall, obstacle_repo: ObstacleRepository, changed_geometry):
+    """Patch cached grids of a wall after one of its obstacles changed."""
+    wall_data = {"id": wall.id, "geometry": wall.geometry}
+    obstacles_data = [{"geometry": o.geometry} for o in obstacle_repo.get_obstacles_by_wall(wall.id)]
+    PlannerService(db=db).patch_cached_grids(wall_data, obstacles_data, changed_geometry)
@@ -0,0 +1,35 @@
+"""Application settings loaded from config.ini."""
+import configparser
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Config file path - can be overridden via environment variable
+CONFIG_PATH = os.getenv(
+    "ROBOT_CONFIG",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config.ini")
+)
+
+config = configparser.ConfigParser(interpolation=None)
+if not config.read(CONFIG_PATH):
+    logger.warning(f"Config file {CONFIG_PATH} not found, using defaults")
+
+# Planning settings
+DEFAULT_RESOLUTION = config.getfloat("planning", "default_resolution", fallback=0.1)
+MAX_GRID_SIZE = config.getint("planning", "max_grid_size", fallback=10000)
+ENABLE_GRID_CACHING = config.getboolean("planning", "enable_grid_caching", fallback=True)
+GRID_BACKEND = config.get("planning", "grid_backend", fallback="vectorized")
+GRID_WORKERS = config.getint("planning", "grid_workers", fallback=1)
+GRID_SHARED_MEMORY = config.getboolean("planning", "grid_shared_memory", fallback=True)
+CONNECTOR_CACHE_MB = config.getint("planning", "connector_cache_mb", fallback=64)
+STRATEGY_WORKERS = config.getint("planning", "strategy_workers", fallback=1)
+ORDERING_ITERATIONS = config.getint("planning", "ordering_iterations", fallback=1000)
+STORE_PATH_CELLS = config.getboolean("planning", "store_path_cells", fallback=False)
+PLAN_WORKERS = config.getint("planning", "plan_workers", fallback=1)
+PLAN_QUEUE_DEPTH = config.getint("planning", "plan_queue_depth", fallback=16)
+PLAN_QUEUE = config.get("planning", "plan_queue", fallback="local")
+PLAN_LEASE_SECONDS = config.getint("planning", "plan_lease_seconds", fallback=60)
+PLAN_MAX_ATTEMPTS = config.getint("planning", "plan_max_attempts", fallback=3)
+PLAN_POLL_SECONDS = config.getfloat("planning", "plan_poll_seconds", fallback=1.0)
+PLAN_CACHE_MB = config.getint("planning", "plan_cache_mb", fallback=64)
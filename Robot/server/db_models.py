@@ -1,5 +1,5 @@
 """SQLAlchemy ORM models for the robot planner database."""
-from sqlalchemy import Column, String, Float, Integer, Text, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, String, Float, Integer, Text, DateTime, ForeignKey, JSON, LargeBinary, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from database import Base
@@ -54,13 +54,29 @@ class Plan(Base):
     wall_id = Column(String, ForeignKey("walls.id", ondelete="CASCADE"), nullable=False)
     resolution = Column(Float, nullable=False)
     best_path_id = Column(String, nullable=True)  # Reference to best path
-    status = Column(String, default="PENDING")  # PENDING, COMPLETED, FAILED
+    status = Column(String, default="PENDING")  # PENDING, RUNNING, COMPLETED, FAILED
+    summary = Column(JSON, nullable=True)  # Candidates, pruned and skipped strategies once COMPLETED
+    error = Column(Text, nullable=True)  # Failure reason once FAILED
+    options = Column(JSON, nullable=True)  # Planner options of the request, for queue workers
+    request_key = Column(String, nullable=True, index=True)  # Fingerprint of geometry, resolution and options
+    lease_owner = Column(String, nullable=True)  # Queue worker that claimed the plan
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)  # Reclaimable by other workers after this
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)  # Last lease renewal
+    attempts = Column(Integer, default=0)  # Times a queue worker claimed the plan
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     completed_at = Column(DateTime(timezone=True), nullable=True)
 
     # Relationships
     wall = relationship("Wall", back_populates="plans")
     paths = relationship("Path", back_populates="plan", cascade="all, delete-orphan")
+    cache_entries = relationship("PlanCache", back_populates="plan", cascade="all, delete-orphan")
+
+    # One plan in flight per request key, so identical requests share it across processes
+    __table_args__ = (
+        Index("uq_plans_in_flight_request_key", "request_key", unique=True,
+              sqlite_where=text("status IN ('PENDING', 'RUNNING')"),
+              postgresql_where=text("status IN ('PENDING', 'RUNNING')")),
+    )
 
     def __repr__(self):
         return f"<Plan(id={self.id}, wall_id={self.wall_id}, status={self.status})>"
@@ -73,7 +89,8 @@ class Path(Base):
     id = Column(String, primary_key=True, default=generate_uuid)
     plan_id = Column(String, ForeignKey("plans.id", ondelete="CASCADE"), nullable=False)
     strategy = Column(String, nullable=False)  # "horizontal", "vertical", etc.
-    path_data = Column(JSON, nullable=False)  # Store full path as list of coordinates
+    path_data = Column(JSON, nullable=True)  # Full path as list of coordinates, only if store_path_cells is set
+    waypoints = Column(JSON, nullable=True)  # Turn-point polylines, losslessly expandable to path_data
     coverage = Column(Float, nullable=False)
     path_length = Column(Integer, nullable=False)
     execution_status = Column(String, default="NOT_STARTED")  # NOT_STARTED, RUNNING, COMPLETED, FAILED
@@ -113,8 +130,33 @@ class Grid(Base):
     id = Column(String, primary_key=True, default=generate_uuid)
     wall_id = Column(String, ForeignKey("walls.id", ondelete="CASCADE"), nullable=False)
     resolution = Column(Float, nullable=False)
-    grid_data = Column(JSON, nullable=False)  # Serialized numpy array
+    grid_data = Column(JSON, nullable=True)  # Legacy nested-list array, converted to grid_blob by migrate.py
+    grid_blob = Column(LargeBinary, nullable=True)  # zlib-compressed cells, bit-packed if encoding is packbits
+    height = Column(Integer, nullable=True)
+    width = Column(Integer, nullable=True)
+    dtype = Column(String, nullable=True)  # numpy dtype of the decoded array
+    encoding = Column(String, nullable=True)  # packbits (0/1 grids) or raw
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     def __repr__(self):
         return f"<Grid(id={self.id}, wall_id={self.wall_id}, resolution={self.resolution})>"
+
+
+class PlanCache(Base):
+    """Plan cache entity mapping a geometry, resolution and options hash to a completed plan."""
+    __tablename__ = "plan_cache"
+
+    id = Column(String, primary_key=True, default=generate_uuid)
+    cache_key = Column(String, nullable=False, unique=True)  # services.fingerprint.cache_key
+    plan_id = Column(String, ForeignKey("plans.id", ondelete="CASCADE"), nullable=False)  # Plan the entry was taken from
+    payload = Column(LargeBinary, nullable=True)  # Compressed summary and paths that cache hits are cloned from
+    size_bytes = Column(Integer, nullable=False)  # Size of payload, counted against plan_cache_mb
+    hits = Column(Integer, default=0)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_used_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Relationships
+    plan = relationship("Plan", back_populates="cache_entries")
+
+    def __repr__(self):
+        return f"<PlanCache(id={self.id}, plan_id={self.plan_id}, hits={self.hits})>"
@@ -4,6 +4,10 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from api import walls, planning, execution, telemetry, monitoring
+from services.plan_jobs import plan_jobs
+from config import PLAN_QUEUE
+from database import get_db_context
+from repositories import PlanRepository
 
 # Configure logging
 logging.basicConfig(
@@ -19,9 +23,16 @@ async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting application...")
     logger.info("Note: Database tables must exist (run 'python Server/migrate.py migrate' first)")
+    if PLAN_QUEUE == "local":
+        # Plans queued by a previous server process died with its pool
+        with get_db_context() as db:
+            orphaned = PlanRepository(db).fail_orphaned_plans("Orphaned: the server restarted before the plan ran")
+        if orphaned:
+            logger.warning(f"Marked {orphaned} orphaned plans FAILED")
     yield
-    # Shutdown: cleanup if needed
+    # Shutdown: let running plans finish, plans still queued are marked FAILED
     logger.info("Shutting down application...")
+    plan_jobs.shutdown()
 
 
 app = FastAPI(
@@ -10,8 +10,12 @@ import os
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+import numpy as np
+from sqlalchemy import inspect, text, MetaData, select, update
+
 from database import Base, engine, DATABASE_URL
-from db_models import Wall, Obstacle, Plan, Path, Execution, Grid  # Import all models
+from db_models import Wall, Obstacle, Plan, Path, Execution, Grid, PlanCache  # Import all models
+from repositories import GridRepository
 
 logging.basicConfig(
     level=logging.INFO,
@@ -30,8 +34,15 @@ def run_migrations():
     try:
         logger.info("Creating database tables")
         Base.metadata.create_all(bind=engine)
+
+        logger.info("Upgrading existing tables")
+        with engine.begin() as conn:
+            _add_missing_columns(conn)
+            _release_duplicate_request_keys(conn)
+            _create_missing_indexes(conn)
+            _relax_not_null_columns(conn)
+            _pack_legacy_grids(conn)
         
-        from sqlalchemy import inspect
         inspector = inspect(engine)
         tables = inspector.get_table_names()
         
@@ -52,14 +63,121 @@ def run_migrations():
         return False
 
 
+def _add_missing_columns(conn):
+    """Add model columns that are missing from tables created by older versions."""
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            column_type = column.type.compile(dialect=conn.dialect)
+            logger.info(f"Adding column {table.name}.{column.name} ({column_type})")
+            conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+
+
+def _release_duplicate_request_keys(conn):
+    """
+    Clear the request key of all but the newest in-flight plan per key.
+    
+    Older versions coalesced requests only within a process, so several
+    PENDING or RUNNING plans may share a key that must now be unique.
+    """
+    plans = Plan.__table__
+    in_flight = conn.execute(
+        select(plans.c.id, plans.c.request_key)
+        .where(plans.c.request_key.isnot(None), plans.c.status.in_(("PENDING", "RUNNING")))
+        .order_by(plans.c.created_at.desc())
+    ).all()
+    seen = set()
+    for plan_id, key in in_flight:
+        if key in seen:
+            conn.execute(update(plans).where(plans.c.id == plan_id).values(request_key=None))
+        seen.add(key)
+
+
+def _create_missing_indexes(conn):
+    """Create model indexes that are missing from tables created by older versions."""
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        if inspector.has_table(table.name):
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
+
+def _relax_not_null_columns(conn):
+    """Drop NOT NULL from columns the models have since made nullable."""
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {c["name"]: c for c in inspector.get_columns(table.name)}
+        relaxed = [
+            column.name for column in table.columns
+            if column.nullable and column.name in existing and not existing[column.name]["nullable"]
+        ]
+        if not relaxed:
+            continue
+
+        logger.info(f"Making {table.name} columns {relaxed} nullable")
+        if conn.dialect.name != "sqlite":
+            for name in relaxed:
+                conn.execute(text(f'ALTER TABLE {table.name} ALTER COLUMN {name} DROP NOT NULL'))
+            continue
+
+        # SQLite cannot alter column constraints, so rebuild the table from the model
+        staging = f"{table.name}_migrating"
+        metadata = MetaData()
+        # Referenced tables have to be known for the copy's foreign keys to resolve
+        for other in Base.metadata.sorted_tables:
+            if other is not table:
+                other.to_metadata(metadata)
+        table.to_metadata(metadata, name=staging).create(conn)
+        columns = ", ".join(name for name in existing if name in table.columns)
+        conn.execute(text(f'INSERT INTO {staging} ({columns}) SELECT {columns} FROM {table.name}'))
+        conn.execute(text(f'DROP TABLE {table.name}'))
+        conn.execute(text(f'ALTER TABLE {staging} RENAME TO {table.name}'))
+
+
+def _pack_legacy_grids(conn):
+    """
+    Convert cached grids stored as JSON lists to compressed binary blobs.
+    
+    Lists that do not hold a non-empty 2D grid, such as the [] of a wall too
+    thin for a single row, are cleared instead; the grid is rebuilt the next
+    time the wall is planned.
+    """
+    grids = Grid.__table__
+    legacy = select(grids.c.id).where(grids.c.grid_blob.is_(None), grids.c.grid_data.isnot(None))
+    ids = conn.execute(legacy).scalars().all()
+    if not ids:
+        return
+
+    logger.info(f"Converting {len(ids)} cached grids to binary storage")
+    for grid_id in ids:
+        # One row at a time, so only one decoded grid is held in memory
+        grid_data = conn.execute(select(grids.c.grid_data).where(grids.c.id == grid_id)).scalar_one()
+        try:
+            grid_data = np.array(grid_data, dtype=np.uint8)
+        except ValueError:
+            grid_data = None  # Ragged rows
+        if grid_data is None or grid_data.ndim != 2 or grid_data.size == 0:
+            logger.warning(f"Clearing cached grid {grid_id}, which holds no 2D grid")
+            conn.execute(update(grids).where(grids.c.id == grid_id).values(grid_data=None))
+            continue
+        columns = GridRepository.encode_grid(grid_data)
+        conn.execute(update(grids).where(grids.c.id == grid_id).values(**columns))
+
+
 def check_migration_status():
     """Check if migrations have been run."""
     try:
-        from sqlalchemy import inspect
         inspector = inspect(engine)
         tables = inspector.get_table_names()
         
-        expected_tables = {'walls', 'obstacles', 'plans', 'paths', 'executions', 'grids'}
+        expected_tables = {'walls', 'obstacles', 'plans', 'paths', 'executions', 'grids', 'plan_cache'}
         existing_tables = set(tables)
         
         if expected_tables.issubset(existing_tables):
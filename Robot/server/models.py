@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
 
 class Polygon(BaseModel):
     coordinates: List[List[float]]  # [[x,y], [x,y], ...]
@@ -14,16 +14,42 @@ class CreateObstacleRequest(BaseModel):
 
 class PlanRequest(BaseModel):
     resolution: float = 0.1
+    connector: Literal["astar", "jps"] = "astar"  # Connector search between sweep segments
+    sweep_angles: List[float] = Field(default_factory=list, max_length=36)  # Extra sweep angles in degrees
+    deadline_ms: Optional[int] = Field(None, gt=0)  # Return the best plan finished within this budget
+    coarse_resolution: Optional[float] = Field(None, gt=0)  # Plan on this coarser grid first, then refine
 
 class WallResponse(BaseModel):
     wall_id: str
 
 class PlanCandidate(BaseModel):
     path_id: str
+    strategy: str
+    angle: Optional[float] = None  # Sweep angle for angled sweep candidates
     coverage: float
     path_length: int
+    turns: int = 0
+    revisited_cells: int = 0
+    connector_overhead: float = 0.0
+    components: int = 1
+    cross_component_jumps: int = 0
+
+class PrunedCandidate(BaseModel):
+    strategy: str
+    reason: Literal["coverage", "path_length", "coarse"]  # Bound that could no longer beat the best candidate
+    bound: Optional[float] = None  # The candidate could not have done better than this; None for coarse
+    estimated_length: Optional[int] = None  # Coarse plan's path length scaled to the fine grid, for coarse
+
+class PlanJobResponse(BaseModel):
+    plan_id: str
+    status: str  # PENDING until a plan worker picks the plan up
+    coalesced: bool = False  # Joined an identical plan that was already in flight
+    cached: bool = False  # Completed at once from a cached plan of identical geometry
 
 class PlanResponse(BaseModel):
     plan_id: str
     best_path_id: str
-    candidates: List[PlanCandidate]
\ No newline at end of file
+    candidates: List[PlanCandidate]
+    pruned: List[PrunedCandidate] = []
+    skipped: List[str] = []  # Strategies not evaluated before deadline_ms ran out
+    best_angle: Optional[float] = None  # Best of the requested sweep angles
\ No newline at end of file
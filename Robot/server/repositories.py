@@ -1,14 +1,22 @@
 """Repository layer for database operations."""
 import logging
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import and_, or_
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.sql import func
 from typing import List, Optional
-from db_models import Wall, Obstacle, Plan, Path, Execution, Grid
+from db_models import Wall, Obstacle, Plan, Path, Execution, Grid, PlanCache
+import json
 import numpy as np
+import zlib
 
 logger = logging.getLogger(__name__)
 
 
+def _utcnow():
+    return datetime.now(timezone.utc)
+
+
 class WallRepository:
     """Repository for Wall operations."""
     
@@ -57,13 +65,17 @@ class ObstacleRepository:
         self.db.refresh(obstacle)
         return obstacle
     
+    def get_obstacle(self, obstacle_id: str) -> Optional[Obstacle]:
+        """Get obstacle by ID."""
+        return self.db.query(Obstacle).filter(Obstacle.id == obstacle_id).first()
+    
     def get_obstacles_by_wall(self, wall_id: str) -> List[Obstacle]:
         """Get all obstacles for a wall."""
         return self.db.query(Obstacle).filter(Obstacle.wall_id == wall_id).all()
     
     def delete_obstacle(self, obstacle_id: str) -> bool:
         """Delete an obstacle."""
-        obstacle = self.db.query(Obstacle).filter(Obstacle.id == obstacle_id).first()
+        obstacle = self.get_obstacle(obstacle_id)
         if obstacle:
             self.db.delete(obstacle)
             self.db.commit()
@@ -77,11 +89,26 @@ class PlanRepository:
     def __init__(self, db: Session):
         self.db = db
     
-    def create_plan(self, wall_id: str, resolution: float) -> Plan:
-        """Create a new plan."""
+    def create_plan(self, wall_id: str, resolution: float, options: Optional[dict] = None,
+                    request_key: Optional[str] = None, commit: bool = True) -> Plan:
+        """
+        Create a new plan, with the planner options a queue worker runs it with.
+        
+        At most one PENDING or RUNNING plan may hold a request key; creating a
+        second one raises IntegrityError, after which the session must be
+        rolled back.
+        
+        Args:
+            commit: Commit the new plan; pass False to only flush it, e.g. to
+                    commit it together with its paths
+        """
         logger.info(f"Creating plan for wall {wall_id} with resolution {resolution}")
-        plan = Plan(wall_id=wall_id, resolution=resolution, status="PENDING")
+        plan = Plan(wall_id=wall_id, resolution=resolution, status="PENDING", options=options,
+                    request_key=request_key)
         self.db.add(plan)
+        if not commit:
+            self.db.flush()
+            return plan
         self.db.commit()
         self.db.refresh(plan)
         logger.info(f"Plan created with ID: {plan.id}")
@@ -91,20 +118,188 @@ class PlanRepository:
         """Get plan by ID."""
         return self.db.query(Plan).filter(Plan.id == plan_id).first()
     
-    def update_plan_status(self, plan_id: str, status: str, best_path_id: Optional[str] = None):
-        """Update plan status."""
+    def update_plan_status(self, plan_id: str, status: str, best_path_id: Optional[str] = None,
+                           summary: Optional[dict] = None, error: Optional[str] = None):
+        """Update plan status, recording the result summary or error of a finished plan."""
         plan = self.get_plan(plan_id)
         if plan:
             plan.status = status
             if best_path_id:
                 plan.best_path_id = best_path_id
+            if summary is not None:
+                plan.summary = summary
+            if error is not None:
+                plan.error = error
+            if status in ("COMPLETED", "FAILED"):
+                plan.completed_at = func.now()
             self.db.commit()
             self.db.refresh(plan)
         return plan
     
+    def start_plan(self, plan_id: str) -> bool:
+        """
+        Move a PENDING plan to RUNNING.
+        
+        Like finish_plan it is a conditional UPDATE, so a plan failed as an
+        orphan meanwhile is not brought back.
+        
+        Returns:
+            Whether the plan was updated
+        """
+        started = self.db.query(Plan).filter(Plan.id == plan_id, Plan.status == "PENDING").update(
+            {Plan.status: "RUNNING"}, synchronize_session=False
+        )
+        self.db.commit()
+        return bool(started)
+    
+    def finish_plan(self, plan_id: str, status: str, lease_owner: Optional[str] = None,
+                    best_path_id: Optional[str] = None, summary: Optional[dict] = None,
+                    error: Optional[str] = None, commit: bool = True) -> bool:
+        """
+        Move a RUNNING plan to COMPLETED or FAILED.
+        
+        The transition is a conditional UPDATE on the plan still being RUNNING
+        and, when lease_owner is given, still leased to it, so a worker whose
+        lease was taken over cannot overwrite the new owner's plan.
+        
+        Args:
+            commit: Commit the transaction; pass False to commit it together
+                    with other writes, or roll them back when nothing matched
+        
+        Returns:
+            Whether the plan was updated
+        """
+        fence = [Plan.id == plan_id, Plan.status == "RUNNING"]
+        if lease_owner is not None:
+            fence.append(Plan.lease_owner == lease_owner)
+        values = {Plan.status: status, Plan.completed_at: func.now()}
+        if best_path_id:
+            values[Plan.best_path_id] = best_path_id
+        if summary is not None:
+            values[Plan.summary] = summary
+        if error is not None:
+            values[Plan.error] = error
+        finished = self.db.query(Plan).filter(*fence).update(values, synchronize_session=False)
+        if commit:
+            self.db.commit()
+        return bool(finished)
+    
+    def delete_plan(self, plan_id: str) -> bool:
+        """Delete a plan."""
+        plan = self.get_plan(plan_id)
+        if plan:
+            self.db.delete(plan)
+            self.db.commit()
+            return True
+        return False
+    
     def get_plans_by_wall(self, wall_id: str) -> List[Plan]:
         """Get all plans for a wall."""
         return self.db.query(Plan).filter(Plan.wall_id == wall_id).all()
+    
+    def get_in_flight_plan(self, request_key: str) -> Optional[Plan]:
+        """Get the newest PENDING or RUNNING plan of a request key."""
+        return self.db.query(Plan).filter(
+            Plan.request_key == request_key, Plan.status.in_(("PENDING", "RUNNING"))
+        ).order_by(Plan.created_at.desc()).first()
+    
+    def lease_expired(self, plan_id: str) -> bool:
+        """Whether a plan is RUNNING on a lease that expired."""
+        return self.db.query(Plan).filter(
+            Plan.id == plan_id, Plan.status == "RUNNING", Plan.lease_expires_at < _utcnow()
+        ).count() > 0
+    
+    def fail_orphaned_plans(self, error: str, plan_id: Optional[str] = None,
+                            lease_expired: bool = False) -> int:
+        """
+        Mark FAILED PENDING or RUNNING plans that nothing is going to finish.
+        
+        This frees their request keys for new plans. Like finish_plan it is a
+        conditional UPDATE, so a plan that finished meanwhile is left alone.
+        
+        Args:
+            error: Failure reason recorded on the plans
+            plan_id: Only fail this plan; all unleased in-flight plans if None
+            lease_expired: Only fail RUNNING plans whose lease expired, leaving
+                           plans a queue worker holds or just reclaimed alone
+        
+        Returns:
+            Number of plans marked FAILED
+        """
+        fence = [Plan.status.in_(("PENDING", "RUNNING"))]
+        if plan_id is not None:
+            fence.append(Plan.id == plan_id)
+        if lease_expired:
+            fence += [Plan.status == "RUNNING", Plan.lease_expires_at < _utcnow()]
+        else:
+            fence.append(Plan.lease_owner.is_(None))
+        failed = self.db.query(Plan).filter(*fence).update({
+            Plan.status: "FAILED",
+            Plan.error: error,
+            Plan.completed_at: func.now()
+        }, synchronize_session=False)
+        self.db.commit()
+        return failed
+    
+    def count_plans(self, status: str) -> int:
+        """Count plans in a status."""
+        return self.db.query(Plan).filter(Plan.status == status).count()
+    
+    def claim_plan(self, owner: str, lease_seconds: float) -> Optional[Plan]:
+        """
+        Claim the oldest PENDING plan, or a RUNNING plan whose lease expired.
+        
+        The claim is a conditional UPDATE on the row, so when several workers
+        race for the same plan exactly one of them gets it.
+        
+        Returns:
+            The claimed plan, RUNNING and leased to owner, or None if none is claimable
+        """
+        while True:
+            now = _utcnow()
+            claimable = or_(Plan.status == "PENDING",
+                            and_(Plan.status == "RUNNING", Plan.lease_expires_at < now))
+            candidate = self.db.query(Plan.id).filter(claimable).order_by(Plan.created_at).first()
+            if candidate is None:
+                return None
+            
+            claimed = self.db.query(Plan).filter(Plan.id == candidate.id, claimable).update({
+                Plan.status: "RUNNING",
+                Plan.lease_owner: owner,
+                Plan.lease_expires_at: now + timedelta(seconds=lease_seconds),
+                Plan.heartbeat_at: now,
+                Plan.attempts: func.coalesce(Plan.attempts, 0) + 1
+            }, synchronize_session=False)
+            self.db.commit()
+            if claimed:
+                return self.get_plan(candidate.id)
+            # Another worker claimed it first, try the next one
+    
+    def renew_lease(self, plan_id: str, owner: str, lease_seconds: float) -> bool:
+        """Extend owner's lease on a RUNNING plan; False once the lease was lost."""
+        now = _utcnow()
+        renewed = self.db.query(Plan).filter(
+            Plan.id == plan_id, Plan.status == "RUNNING", Plan.lease_owner == owner
+        ).update({
+            Plan.lease_expires_at: now + timedelta(seconds=lease_seconds),
+            Plan.heartbeat_at: now
+        }, synchronize_session=False)
+        self.db.commit()
+        return bool(renewed)
+    
+    def fail_exhausted_plans(self, max_attempts: int) -> int:
+        """Mark FAILED the expired RUNNING plans that were claimed max_attempts times."""
+        failed = self.db.query(Plan).filter(
+            Plan.status == "RUNNING",
+            Plan.lease_expires_at < _utcnow(),
+            Plan.attempts >= max_attempts
+        ).update({
+            Plan.status: "FAILED",
+            Plan.error: f"Lease expired after {max_attempts} attempts",
+            Plan.completed_at: func.now()
+        }, synchronize_session=False)
+        self.db.commit()
+        return failed
 
 
 class PathRepository:
@@ -113,19 +308,29 @@ class PathRepository:
     def __init__(self, db: Session):
         self.db = db
     
-    def create_path(self, plan_id: str, strategy: str, path_data: List, 
-                   coverage: float, path_length: int) -> Path:
-        """Create a new path."""
+    def create_path(self, plan_id: str, strategy: str, path_data, 
+                   coverage: float, path_length: int, waypoints: Optional[List] = None,
+                   commit: bool = True) -> Path:
+        """
+        Create a new path from a list or (N, 2) array of cells and/or its waypoints.
+        
+        With commit=False the path is only flushed, and is written or dropped
+        with the rest of the caller's transaction.
+        """
         path = Path(
             plan_id=plan_id,
             strategy=strategy,
-            path_data=path_data,
+            path_data=np.asarray(path_data).tolist() if path_data is not None else None,
+            waypoints=waypoints,
             coverage=coverage,
             path_length=path_length
         )
         self.db.add(path)
-        self.db.commit()
-        self.db.refresh(path)
+        if commit:
+            self.db.commit()
+            self.db.refresh(path)
+        else:
+            self.db.flush()
         return path
     
     def get_path(self, path_id: str) -> Optional[Path]:
@@ -201,7 +406,7 @@ class GridRepository:
             grid = Grid(
                 wall_id=wall_id,
                 resolution=resolution,
-                grid_data=grid_data.tolist()
+                **self.encode_grid(grid_data)
             )
             self.db.add(grid)
             self.db.commit()
@@ -209,7 +414,171 @@ class GridRepository:
         
         return grid
     
+    def get_grids_by_wall(self, wall_id: str) -> List[Grid]:
+        """Get all cached grids for a wall, one per resolution."""
+        return self.db.query(Grid).filter(Grid.wall_id == wall_id).all()
+    
+    @staticmethod
+    def encode_grid(grid_data: np.ndarray) -> dict:
+        """
+        Encode an array into the binary columns of a grid row.
+        
+        Occupancy grids hold only 0 and 1, so they are bit-packed to one
+        bit per cell before zlib compression; other arrays keep their bytes.
+        
+        Returns:
+            Dict of grid_blob, height, width, dtype and encoding column values,
+            with the legacy grid_data column cleared
+        """
+        grid_data = np.ascontiguousarray(grid_data)
+        height, width = grid_data.shape
+        binary = not np.any(grid_data > 1) and not np.any(grid_data < 0)
+        raw = np.packbits(grid_data.astype(bool, copy=False)) if binary else grid_data
+        return {
+            "grid_data": None,
+            "grid_blob": zlib.compress(raw.tobytes()),
+            "height": height,
+            "width": width,
+            "dtype": grid_data.dtype.str,
+            "encoding": "packbits" if binary else "raw"
+        }
+    
+    @staticmethod
+    def has_grid_data(grid: Grid) -> bool:
+        """Whether a grid row holds an array, in either storage format."""
+        return grid.grid_blob is not None or bool(grid.grid_data)
+    
+    @staticmethod
+    def load_grid_data(grid: Grid) -> np.ndarray:
+        """Decode a cached grid row into a writable occupancy array."""
+        if grid.grid_blob is None:
+            # Row written before binary storage and not migrated yet
+            return np.array(grid.grid_data, dtype=np.uint8)
+        
+        raw = zlib.decompress(grid.grid_blob)
+        shape = (grid.height, grid.width)
+        if grid.encoding == "packbits":
+            cells = np.unpackbits(np.frombuffer(raw, dtype=np.uint8), count=shape[0] * shape[1])
+            return cells.reshape(shape).astype(grid.dtype, copy=False)
+        return np.frombuffer(bytearray(raw), dtype=grid.dtype).reshape(shape)
+    
+    def update_grid_data(self, grid: Grid, grid_data: np.ndarray) -> Grid:
+        """Replace the cached array of a grid row."""
+        for column, value in self.encode_grid(grid_data).items():
+            setattr(grid, column, value)
+        self.db.commit()
+        self.db.refresh(grid)
+        return grid
+    
+    def delete_grid(self, grid: Grid):
+        """Delete a single cached grid."""
+        self.db.delete(grid)
+        self.db.commit()
+    
     def invalidate_grid(self, wall_id: str):
         """Invalidate all cached grids for a wall."""
         self.db.query(Grid).filter(Grid.wall_id == wall_id).delete()
         self.db.commit()
+
+
+class PlanCacheRepository:
+    """Repository for plan result cache operations."""
+    
+    def __init__(self, db: Session):
+        self.db = db
+    
+    def get_entry(self, cache_key: str) -> Optional[PlanCache]:
+        """Get the cache entry of a key and mark it as recently used."""
+        entry = self.db.query(PlanCache).filter(PlanCache.cache_key == cache_key).first()
+        if entry:
+            entry.hits = (entry.hits or 0) + 1
+            entry.last_used_at = _utcnow()
+            self.db.commit()
+            self.db.refresh(entry)
+        return entry
+    
+    def put_entry(self, cache_key: str, plan_id: str, payload: bytes, max_bytes: int) -> Optional[PlanCache]:
+        """
+        Cache a completed plan under a key, then evict least recently used
+        entries until the cache fits max_bytes.
+        
+        The entry owns its payload, so the bytes counted against max_bytes
+        are exactly the bytes eviction frees.
+        
+        Args:
+            payload: encode_plan of the plan
+        """
+        size_bytes = len(payload)
+        if size_bytes > max_bytes:
+            return None
+        entry = self.db.query(PlanCache).filter(PlanCache.cache_key == cache_key).first()
+        if entry:
+            entry.plan_id = plan_id
+            entry.payload = payload
+            entry.size_bytes = size_bytes
+        else:
+            entry = PlanCache(cache_key=cache_key, plan_id=plan_id, payload=payload, size_bytes=size_bytes,
+                              last_used_at=_utcnow())
+            self.db.add(entry)
+        self.db.commit()
+        self.evict(max_bytes)
+        return entry
+    
+    @staticmethod
+    def encode_plan(summary: dict, best_path_id: Optional[str], paths: List[Path]) -> bytes:
+        """
+        Serialize a completed plan's summary and paths into a cache payload.
+        
+        Path ids are kept so the summary's candidates can be pointed at the
+        clones made from the payload.
+        """
+        plan = {
+            "summary": summary,
+            "best_path_id": best_path_id,
+            "paths": [
+                {
+                    "id": p.id,
+                    "strategy": p.strategy,
+                    "coverage": p.coverage,
+                    "path_length": p.path_length,
+                    "waypoints": p.waypoints,
+                    "path_data": p.path_data
+                }
+                for p in paths
+            ]
+        }
+        return zlib.compress(json.dumps(plan, separators=(",", ":")).encode())
+    
+    @staticmethod
+    def decode_plan(payload: bytes) -> dict:
+        """Decode a cache payload into its summary, best_path_id and paths."""
+        return json.loads(zlib.decompress(payload))
+    
+    def delete_entry(self, entry: PlanCache):
+        """Delete a cache entry; the plan it points to is kept."""
+        self.db.delete(entry)
+        self.db.commit()
+    
+    def evict(self, max_bytes: int) -> int:
+        """Delete least recently used entries until the cache fits max_bytes."""
+        total = self.db.query(func.coalesce(func.sum(PlanCache.size_bytes), 0)).scalar()
+        evicted = 0
+        for entry in self.db.query(PlanCache).order_by(PlanCache.last_used_at):
+            if total <= max_bytes:
+                break
+            total -= entry.size_bytes
+            self.db.delete(entry)
+            evicted += 1
+        if evicted:
+            self.db.commit()
+            logger.info(f"Evicted {evicted} plan cache entries")
+        return evicted
+    
+    def stats(self) -> dict:
+        """Return entry count, stored bytes and hits of the cache."""
+        entries, size, hits = self.db.query(
+            func.count(PlanCache.id),
+            func.coalesce(func.sum(PlanCache.size_bytes), 0),
+            func.coalesce(func.sum(PlanCache.hits), 0)
+        ).one()
+        return {"entries": entries, "bytes": size, "hits": hits}
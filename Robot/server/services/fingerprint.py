@@ -0,0 +1,95 @@
+"""Canonical fingerprints of plan inputs for deduplication and caching."""
+import hashlib
+import json
+
+# Coordinates are compared after rounding to this many decimals (metres)
+PRECISION = 6
+
+
+def _canonical_ring(coords):
+    """Ring of rounded points, independent of its start vertex, orientation and closing point."""
+    points = [(round(x, PRECISION) + 0.0, round(y, PRECISION) + 0.0) for x, y in coords]
+    if len(points) > 1 and points[0] == points[-1]:
+        points = points[:-1]
+    if not points:
+        return []
+
+    # Counter-clockwise by the shoelace sign, starting at the smallest vertex
+    area = sum(x0 * y1 - x1 * y0 for (x0, y0), (x1, y1) in zip(points, points[1:] + points[:1]))
+    if area < 0:
+        points.reverse()
+    start = points.index(min(points))
+    return [list(p) for p in points[start:] + points[:start]]
+
+
+def geometry_fingerprint(wall_geometry, obstacle_geometries):
+    """
+    Hash of a wall polygon and its obstacles, equal for identical geometry.
+
+    Coordinates are absolute: grid cells are sampled at absolute positions,
+    so the same geometry moved elsewhere can round edges that lie on sample
+    points the other way and get a different grid. Copies of a wall on
+    other storeys keep their coordinates and fingerprint. Obstacle order
+    does not matter.
+
+    Args:
+        wall_geometry: Wall polygon as [[x, y], ...]
+        obstacle_geometries: Obstacle polygons as [[x, y], ...]
+
+    Returns:
+        Hex digest
+    """
+    canonical = {
+        "wall": _canonical_ring(wall_geometry),
+        "obstacles": sorted(_canonical_ring(g) for g in obstacle_geometries)
+    }
+    return _digest(canonical)
+
+
+def request_key(wall_id, fingerprint, resolution, options):
+    """
+    Key of a plan request: identical keys plan the same wall the same way.
+
+    Sweep angles count as a set, since their order does not change the best plan.
+
+    Args:
+        wall_id: Wall the plan belongs to
+        fingerprint: geometry_fingerprint of the wall and its obstacles
+        resolution: Grid resolution
+        options: Planner options of the request (connector, sweep_angles, ...)
+
+    Returns:
+        Hex digest
+    """
+    return _digest({"wall_id": wall_id, "geometry": fingerprint, "resolution": resolution,
+                    "options": _canonical_options(options)})
+
+
+def cache_key(fingerprint, resolution, options):
+    """
+    Key of a plan result, shared by every wall with the same geometry.
+
+    The deadline is left out: only plans that evaluated every strategy are
+    cached, and those are the same whatever deadline they ran under.
+
+    Args:
+        fingerprint: geometry_fingerprint of the wall and its obstacles
+        resolution: Grid resolution
+        options: Planner options of the request (connector, sweep_angles, ...)
+
+    Returns:
+        Hex digest
+    """
+    options = {k: v for k, v in _canonical_options(options).items() if k != "deadline_ms"}
+    return _digest({"geometry": fingerprint, "resolution": resolution, "options": options})
+
+
+def _canonical_options(options):
+    options = dict(options)
+    options["sweep_angles"] = sorted({float(a) for a in options.get("sweep_angles") or []})
+    return options
+
+
+def _digest(value):
+    text = json.dumps(value, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(text.encode()).hexdigest()
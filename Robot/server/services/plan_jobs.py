@@ -0,0 +1,135 @@
+"""Process pool that runs plan jobs off the API event loop."""
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from database import engine, get_db_context
+from repositories import PlanRepository
+from config import PLAN_WORKERS, PLAN_QUEUE_DEPTH
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(RuntimeError):
+    """Raised when a plan job is submitted while the queue is at capacity."""
+
+
+def _init_worker():
+    # Connections inherited from the API process must not be shared with it
+    engine.dispose(close=False)
+
+
+def _run_plan_job(plan_id, wall, obstacles, resolution, options):
+    """Pool entry point: run one PENDING plan with a session of its own."""
+    from services.planner_service import PlannerService
+
+    with get_db_context() as db:
+        PlannerService(db).run_plan(wall, obstacles, resolution, plan_id=plan_id, **options)
+    return plan_id
+
+
+class PlanJobQueue:
+    """
+    Bounded queue of plan jobs run by a pool of worker processes.
+
+    At most workers plans run at once and at most depth more wait for a
+    worker; submitting beyond that raises QueueFullError. The pool is
+    started on the first submission.
+
+    The queue lives in one API process, so only that process can tell
+    whether a PENDING or RUNNING plan it created is still going to run.
+    """
+
+    def __init__(self, workers=PLAN_WORKERS, depth=PLAN_QUEUE_DEPTH):
+        self.workers = max(workers, 1)
+        self.depth = depth
+        self._pool = None
+        self._lock = threading.Lock()
+        self._plan_ids = set()
+        self._outstanding = 0
+        self._submitted = 0
+        self._rejected = 0
+        self._coalesced = 0
+
+    def submit(self, plan_id, wall, obstacles, resolution, **options):
+        """
+        Queue a PENDING plan for a worker process.
+
+        Args:
+            plan_id: Plan row the worker runs and updates
+            wall: Wall data with id and geometry
+            obstacles: List of obstacle data with geometry
+            resolution: Grid resolution
+            **options: Keyword arguments passed on to PlannerService.run_plan
+
+        Raises:
+            QueueFullError: If workers + depth jobs are already outstanding
+        """
+        with self._lock:
+            if self._outstanding >= self.workers + self.depth:
+                self._rejected += 1
+                raise QueueFullError(f"Plan queue is full ({self._outstanding} plans outstanding)")
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+            self._outstanding += 1
+            self._submitted += 1
+            self._plan_ids.add(plan_id)
+            pool = self._pool
+            future = pool.submit(_run_plan_job, plan_id, wall, obstacles, resolution, options)
+        future.add_done_callback(lambda f: self._finished(plan_id, pool, f))
+        logger.info(f"PlanJobQueue: Queued plan {plan_id}")
+        return future
+
+    def _finished(self, plan_id, pool, future):
+        with self._lock:
+            self._outstanding -= 1
+            self._plan_ids.discard(plan_id)
+            if not future.cancelled() and isinstance(future.exception(), BrokenProcessPool) and self._pool is pool:
+                # A worker died; the next submission starts a fresh pool
+                self._pool = None
+        if future.cancelled():
+            error = "Cancelled at shutdown before it ran"
+        elif future.exception() is not None:
+            error = repr(future.exception())
+        else:
+            return
+        # run_plan marks its own failures; this catches jobs that never ran or whose worker died
+        logger.error(f"PlanJobQueue: Plan {plan_id} job failed: {error}")
+        with get_db_context() as db:
+            plan_repo = PlanRepository(db)
+            plan = plan_repo.get_plan(plan_id)
+            if plan and plan.status in ("PENDING", "RUNNING"):
+                plan_repo.update_plan_status(plan_id, "FAILED", error=error)
+
+    def holds(self, plan_id):
+        """Whether a plan was submitted here and has not finished yet."""
+        with self._lock:
+            return plan_id in self._plan_ids
+
+    def record_coalesced(self):
+        """Count a request served by an identical plan already in flight."""
+        with self._lock:
+            self._coalesced += 1
+
+    def stats(self):
+        """Return queue occupancy and counters."""
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "depth": self.depth,
+                "outstanding": self._outstanding,
+                "submitted": self._submitted,
+                "rejected": self._rejected,
+                "coalesced": self._coalesced
+            }
+
+    def shutdown(self):
+        """Stop the pool, waiting for running plans to finish."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+
+plan_jobs = PlanJobQueue()
@@ -1,10 +1,10 @@
 """Planner service for coordinating path planning operations."""
 import logging
+import time
 from shapely.geometry import Polygon
 from sqlalchemy.orm import Session
 import sys
 import os
-import numpy as np
 
 logger = logging.getLogger(__name__)
 
@@ -12,8 +12,14 @@ logger = logging.getLogger(__name__)
 sys.path.append(os.path.join(os.path.dirname(__file__), '../../'))
 
 from algorithm import planner as planner_module
-from algorithm.grid_construction import Grid as GridBuilder
-from repositories import PlanRepository, PathRepository, GridRepository
+from algorithm.grid_construction import Grid as GridBuilder, GridSizeError
+from algorithm.path import to_waypoints, from_waypoints
+from repositories import PlanRepository, PathRepository, GridRepository, PlanCacheRepository
+from services.fingerprint import geometry_fingerprint, cache_key
+from config import (GRID_BACKEND, GRID_WORKERS, GRID_SHARED_MEMORY, MAX_GRID_SIZE, CONNECTOR_CACHE_MB,
+                    STRATEGY_WORKERS, ORDERING_ITERATIONS, STORE_PATH_CELLS, PLAN_CACHE_MB)
+
+planner_module.connector_cache.resize(CONNECTOR_CACHE_MB * 1024 * 1024)
 
 
 class PlannerService:
@@ -22,52 +28,118 @@ class PlannerService:
     def __init__(self, db: Session):
         self.db = db
 
-    async def run_plan(self, wall, obstacles, resolution):
+    @staticmethod
+    def path_cells(path):
+        """Cells of a stored path as a list of [r, c], expanding its waypoints if needed."""
+        if path.path_data is not None:
+            return path.path_data
+        return from_waypoints(path.waypoints or []).tolist()
+
+    @staticmethod
+    def path_waypoints(path):
+        """Waypoint polylines of a stored path, compressing legacy cell-only rows."""
+        if path.waypoints is not None:
+            return path.waypoints
+        return to_waypoints(path.path_data or [])
+
+    @staticmethod
+    def connector_cache_stats(plans):
+        """
+        Return connector cache hit/miss counters summed over plans.
+        
+        Plans run in job or queue worker processes, each with a cache of its
+        own, so the counters are read from the plan summaries they wrote.
+        """
+        hits = misses = 0
+        for plan in plans:
+            lookups = (plan.summary or {}).get("connector_cache")
+            if lookups:
+                hits += lookups["hits"]
+                misses += lookups["misses"]
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 3) if hits + misses else 0.0
+        }
+
+    @staticmethod
+    def check_grid_size(wall, resolution):
+        """
+        Reject a plan whose grid would exceed max_grid_size before it is queued.
+
+        Raises:
+            GridSizeError: If the wall's grid at resolution is too large
+        """
+        height, width = GridBuilder.grid_shape(Polygon(wall["geometry"]).bounds, resolution)
+        if max(height, width) > MAX_GRID_SIZE:
+            raise GridSizeError(
+                f"Grid of {height}x{width} cells at resolution {resolution} exceeds "
+                f"max_grid_size={MAX_GRID_SIZE}; use a coarser resolution"
+            )
+
+    def run_plan(self, wall, obstacles, resolution, connector="astar", sweep_angles=None,
+                 deadline_ms=None, coarse_resolution=None, plan_id=None, lease_owner=None):
         """
         Run path planning for a wall with obstacles.
         
+        CPU-bound; the API runs it in a plan job worker (see services.plan_jobs).
+        
         Args:
             wall: Wall data with id and geometry
             obstacles: List of obstacle data with geometry
             resolution: Grid resolution
+            connector: Connector search used between sweep segments ("astar" or "jps")
+            sweep_angles: Extra sweep angles in degrees evaluated as strategies
+            deadline_ms: Time budget for the whole plan, grid construction
+                included; strategies left when it runs out are skipped
+            coarse_resolution: Coarser resolution to plan on first; only the
+                coarse plan's best strategy is refined at resolution
+            plan_id: PENDING plan row to run; a new plan is created when omitted
+            lease_owner: Queue worker holding plan_id's lease; results are
+                discarded if the plan is no longer RUNNING under this lease
+                when they are written
             
         Returns:
-            Tuple of (plan_id, candidates) where candidates is list of path info
+            Dict with plan_id, candidates (list of path info), pruned (strategies
+            abandoned by branch-and-bound), skipped (strategies not run before
+            the deadline) and best_angle, or None if plan_id was no longer
+            PENDING when the plan started or its lease was lost
         """
-        # Create plan record
+        started = time.perf_counter()
+        # Create the plan record, or claim the queued one
         logger.info(f"PlannerService: Starting plan for wall {wall['id']} with resolution {resolution}")
         plan_repo = PlanRepository(self.db)
-        plan_record = plan_repo.create_plan(wall["id"], resolution)
+        if plan_id is None:
+            plan_record = plan_repo.create_plan(wall["id"], resolution)
+            plan_repo.update_plan_status(plan_record.id, "RUNNING")
+        elif lease_owner is None:
+            if not plan_repo.start_plan(plan_id):
+                logger.warning(f"PlannerService: Plan {plan_id} is no longer PENDING, not running it")
+                return None
+            plan_record = plan_repo.get_plan(plan_id)
+        else:
+            # Claimed by the queue worker, already RUNNING under its lease
+            plan_record = plan_repo.get_plan(plan_id)
         
         try:
-            # Check for cached grid
-            grid_repo = GridRepository(self.db)
-            logger.debug(f"PlannerService: Checking grid cache for wall {wall['id']}")
-            cached_grid = grid_repo.get_or_create_grid(wall["id"], resolution)
-            
-            if cached_grid and cached_grid.grid_data:
-                # Use cached grid
-                logger.info(f"PlannerService: Using cached grid for wall {wall['id']}")
-                grid = np.array(cached_grid.grid_data, dtype=np.uint8)
-            else:
-                # Build new grid
-                logger.info(f"PlannerService: Building new grid for wall {wall['id']}")
-                wall_poly = Polygon(wall["geometry"])
-                obs_polys = [Polygon(o["geometry"]) for o in obstacles]
-                grid_builder = GridBuilder()
-                grid = grid_builder.build_grid(wall_poly, obs_polys, resolution)
-                logger.info(f"PlannerService: Grid built with shape {grid.shape}")
-                
-                # Cache the grid
-                grid_repo.get_or_create_grid(wall["id"], resolution, grid)
-                logger.debug(f"PlannerService: Grid cached")
+            grid = self._load_grid(wall, obstacles, resolution)
+            coarse_grid = coarse_scale = None
+            if coarse_resolution and coarse_resolution > resolution:
+                coarse_grid = self._load_grid(wall, obstacles, coarse_resolution)
+                coarse_scale = coarse_resolution / resolution
             
             # Run planning algorithm
             logger.info(f"PlannerService: Running planning algorithms")
-            result = planner_module.plan(grid)
+            hits, misses = planner_module.connector_cache.lookups()
+            result = planner_module.plan(grid, connector=connector, workers=STRATEGY_WORKERS,
+                                         sweep_angles=sweep_angles,
+                                         ordering_iterations=ORDERING_ITERATIONS,
+                                         time_budget=self._remaining_budget(started, deadline_ms),
+                                         coarse_grid=coarse_grid, coarse_scale=coarse_scale)
+            after = planner_module.connector_cache.lookups()
             logger.info(f"PlannerService: Planning complete with {len(result['candidates'])} candidates")
             
-            # Store paths in database
+            # Paths and the COMPLETED status are written in one transaction
             path_repo = PathRepository(self.db)
             candidates = []
             best_path = None
@@ -76,30 +148,213 @@ class PlannerService:
                 path = path_repo.create_path(
                     plan_id=plan_record.id,
                     strategy=candidate["strategy"],
-                    path_data=candidate["path"],
+                    path_data=candidate["path"] if STORE_PATH_CELLS else None,
                     coverage=candidate["metrics"]["coverage"],
-                    path_length=candidate["metrics"]["path_length"]
+                    path_length=candidate["metrics"]["path_length"],
+                    waypoints=to_waypoints(candidate["path"]),
+                    commit=False
                 )
                 
                 candidates.append({
                     "path_id": path.id,
                     "strategy": path.strategy,
+                    "angle": candidate.get("angle"),
                     "coverage": path.coverage,
-                    "path_length": path.path_length
+                    "path_length": path.path_length,
+                    "turns": candidate["metrics"]["turns"],
+                    "revisited_cells": candidate["metrics"]["revisited_cells"],
+                    "connector_overhead": candidate["metrics"]["connector_overhead"],
+                    "components": candidate["metrics"]["components"],
+                    "cross_component_jumps": candidate["metrics"]["cross_component_jumps"],
+                    "best": candidate is result["best"]
                 })
                 
-                if best_path is None or path.coverage > best_path.coverage:
+                if candidate is result["best"]:
                     best_path = path
+
+            pruned = [
+                {"strategy": p["strategy"], "reason": p["reason"], "bound": p["bound"],
+                 "estimated_length": p.get("estimated_length")}
+                for p in result["pruned"]
+            ]
+            
+            summary = {
+                "plan_id": plan_record.id,
+                "candidates": candidates,
+                "pruned": pruned,
+                "skipped": result["skipped"],
+                "best_angle": result["best_angle"],
+                "connector_cache": {
+                    "hits": after[0] - hits,
+                    "misses": after[1] - misses
+                }
+            }
             
-            # Update plan with best path
-            plan_repo.update_plan_status(plan_record.id, "COMPLETED", best_path.id if best_path else None)
+            # Update plan with best path, unless it was taken over or failed meanwhile
+            if not plan_repo.finish_plan(plan_record.id, "COMPLETED", lease_owner,
+                                         best_path.id if best_path else None, summary=summary, commit=False):
+                self.db.rollback()
+                logger.warning(f"PlannerService: Plan {plan_record.id} is no longer ours to finish, discarding results")
+                return None
+            self.db.commit()
             logger.info(f"PlannerService: Plan {plan_record.id} completed successfully. Best path: {best_path.id if best_path else None}")
             
-            return plan_record.id, candidates
+            # Plans that skipped strategies at their deadline are not the full answer, so are not shared
+            if PLAN_CACHE_MB > 0 and not result["skipped"]:
+                options = {"connector": connector, "sweep_angles": sweep_angles, "deadline_ms": deadline_ms,
+                           "coarse_resolution": coarse_resolution}
+                payload = PlanCacheRepository.encode_plan(summary, best_path.id if best_path else None,
+                                                          path_repo.get_paths_by_plan(plan_record.id))
+                PlanCacheRepository(self.db).put_entry(
+                    self.plan_cache_key(wall, obstacles, resolution, options), plan_record.id,
+                    payload, PLAN_CACHE_MB * 1024 * 1024
+                )
+            
+            return summary
             
         except Exception as e:
             # Mark plan as failed
             logger.error(f"PlannerService: Plan {plan_record.id} failed with error: {e}", exc_info=True)
-            plan_repo.update_plan_status(plan_record.id, "FAILED")
+            self.db.rollback()
+            plan_repo.finish_plan(plan_record.id, "FAILED", lease_owner, error=str(e) or type(e).__name__)
             raise e
 
+    @staticmethod
+    def plan_cache_key(wall, obstacles, resolution, options):
+        """Plan cache key of a wall's geometry, resolution and planner options."""
+        fingerprint = geometry_fingerprint(wall["geometry"], [o["geometry"] for o in obstacles])
+        return cache_key(fingerprint, resolution, options)
+
+    def cached_plan(self, wall, obstacles, resolution, options, request_key=None):
+        """
+        Serve a plan from the plan cache by cloning the copy of a completed
+        plan of the same geometry that the cache entry holds.
+        
+        The cache is keyed by geometry rather than wall, so a wall repeated
+        across storeys reuses the paths planned for any of its copies. A
+        changed obstacle changes the key, so stale results are never served.
+        
+        Args:
+            wall: Wall data with id and geometry
+            obstacles: List of obstacle data with geometry
+            resolution: Grid resolution
+            options: Planner options of the request
+            request_key: Request key stored on the new plan
+            
+        Returns:
+            New COMPLETED plan of wall with copies of the cached paths, or None on a miss
+        """
+        if PLAN_CACHE_MB <= 0:
+            return None
+        cache_repo = PlanCacheRepository(self.db)
+        entry = cache_repo.get_entry(self.plan_cache_key(wall, obstacles, resolution, options))
+        if not entry:
+            return None
+        if entry.payload is None:
+            # Entry written before entries held their own copy of the plan
+            cache_repo.delete_entry(entry)
+            return None
+        cached = cache_repo.decode_plan(entry.payload)
+        
+        plan_repo = PlanRepository(self.db)
+        path_repo = PathRepository(self.db)
+        # The clone is committed once, COMPLETED with all of its paths
+        plan_record = plan_repo.create_plan(wall["id"], resolution, options, request_key, commit=False)
+        path_ids = {}
+        for path in cached["paths"]:
+            clone = path_repo.create_path(
+                plan_id=plan_record.id,
+                strategy=path["strategy"],
+                path_data=path["path_data"],
+                coverage=path["coverage"],
+                path_length=path["path_length"],
+                waypoints=path["waypoints"],
+                commit=False
+            )
+            path_ids[path["id"]] = clone.id
+        
+        # Cloning searched no connectors
+        summary = {
+            **cached["summary"],
+            "connector_cache": {"hits": 0, "misses": 0},
+            "plan_id": plan_record.id,
+            "candidates": [{**c, "path_id": path_ids[c["path_id"]]} for c in cached["summary"]["candidates"]]
+        }
+        plan_repo.update_plan_status(plan_record.id, "COMPLETED", path_ids.get(cached["best_path_id"]), summary=summary)
+        logger.info(f"PlannerService: Plan {plan_record.id} served from cached plan {entry.plan_id}")
+        return plan_record
+
+    def _load_grid(self, wall, obstacles, resolution):
+        """Occupancy grid of a wall at resolution, from the grid cache or built and cached."""
+        grid_repo = GridRepository(self.db)
+        logger.debug(f"PlannerService: Checking grid cache for wall {wall['id']} at {resolution}")
+        cached_grid = grid_repo.get_or_create_grid(wall["id"], resolution)
+        
+        if cached_grid and grid_repo.has_grid_data(cached_grid):
+            logger.info(f"PlannerService: Using cached grid for wall {wall['id']} at {resolution}")
+            return grid_repo.load_grid_data(cached_grid)
+        
+        logger.info(f"PlannerService: Building new grid for wall {wall['id']} at {resolution}")
+        wall_poly = Polygon(wall["geometry"])
+        obs_polys = [Polygon(o["geometry"]) for o in obstacles]
+        grid_builder = GridBuilder()
+        grid = grid_builder.build_grid(
+            wall_poly, obs_polys, resolution,
+            backend=GRID_BACKEND,
+            max_grid_size=MAX_GRID_SIZE,
+            workers=GRID_WORKERS,
+            shared=GRID_SHARED_MEMORY
+        )
+        logger.info(f"PlannerService: Grid built with shape {grid.shape}")
+        
+        grid_repo.get_or_create_grid(wall["id"], resolution, grid)
+        logger.debug(f"PlannerService: Grid cached")
+        return grid
+
+    @staticmethod
+    def _remaining_budget(started, deadline_ms):
+        """Seconds left of a deadline_ms budget that started at started, or None."""
+        if deadline_ms is None:
+            return None
+        return max(deadline_ms / 1000 - (time.perf_counter() - started), 0)
+
+    def patch_cached_grids(self, wall, obstacles, changed_geometry):
+        """
+        Patch every cached grid of a wall after an obstacle was added or removed.
+
+        Only the cells inside the changed obstacle's bounding box are
+        re-rasterized, against the wall and the obstacles that remain.
+
+        Args:
+            wall: Wall data with id and geometry
+            obstacles: List of the wall's current obstacle data with geometry
+            changed_geometry: Geometry of the added or removed obstacle
+
+        Returns:
+            Number of cached grids patched
+        """
+        grid_repo = GridRepository(self.db)
+        cached_grids = grid_repo.get_grids_by_wall(wall["id"])
+        if not cached_grids:
+            return 0
+
+        wall_poly = Polygon(wall["geometry"])
+        obs_polys = [Polygon(o["geometry"]) for o in obstacles]
+        region = Polygon(changed_geometry).bounds
+        grid_builder = GridBuilder()
+        patched = 0
+
+        for cached_grid in cached_grids:
+            grid = grid_repo.load_grid_data(cached_grid)
+            if grid.shape != GridBuilder.grid_shape(wall_poly.bounds, cached_grid.resolution):
+                # Stale entry that no longer matches the wall, rebuild on next plan
+                logger.warning(f"PlannerService: Dropping mismatched cached grid {cached_grid.id}")
+                grid_repo.delete_grid(cached_grid)
+                continue
+
+            grid_builder.patch_grid(grid, wall_poly, obs_polys, cached_grid.resolution, region, backend=GRID_BACKEND)
+            grid_repo.update_grid_data(cached_grid, grid)
+            patched += 1
+
+        logger.info(f"PlannerService: Patched {patched} cached grids for wall {wall['id']}")
+        return patched
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Planner worker.
+Claims PENDING plans from the plans table and runs them, so planning can
+scale across hosts sharing the database. Use with plan_queue = database
+in config.ini; start as many workers as needed on any host.
+"""
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import get_db_context
+from repositories import PlanRepository, WallRepository, ObstacleRepository
+from services.planner_service import PlannerService
+from config import PLAN_LEASE_SECONDS, PLAN_MAX_ATTEMPTS, PLAN_POLL_SECONDS
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+class PlanWorker:
+    """
+    Worker that leases plans from the database queue.
+
+    A claimed plan is leased for lease_seconds and a heartbeat thread keeps
+    renewing the lease while the plan runs. When a worker dies its lease
+    expires and another worker reclaims the plan, up to max_attempts claims.
+    """
+
+    def __init__(self, worker_id=None, lease_seconds=PLAN_LEASE_SECONDS,
+                 max_attempts=PLAN_MAX_ATTEMPTS, poll_seconds=PLAN_POLL_SECONDS):
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.poll_seconds = poll_seconds
+        self.stopping = threading.Event()
+
+    def run(self, once=False):
+        """
+        Claim and run plans until stop() is called.
+
+        Args:
+            once: Return as soon as no plan is claimable
+        """
+        logger.info(f"PlanWorker {self.worker_id}: Started")
+        while not self.stopping.is_set():
+            if not self.run_next() and (once or self.stopping.wait(self.poll_seconds)):
+                break
+        logger.info(f"PlanWorker {self.worker_id}: Stopped")
+
+    def run_next(self):
+        """Claim and run one plan; False if none was claimable."""
+        with get_db_context() as db:
+            plan_repo = PlanRepository(db)
+            failed = plan_repo.fail_exhausted_plans(self.max_attempts)
+            if failed:
+                logger.warning(f"PlanWorker {self.worker_id}: Failed {failed} plans out of attempts")
+
+            plan = plan_repo.claim_plan(self.worker_id, self.lease_seconds)
+            if plan is None:
+                return False
+            logger.info(f"PlanWorker {self.worker_id}: Claimed plan {plan.id} (attempt {plan.attempts})")
+
+            wall = WallRepository(db).get_wall(plan.wall_id)
+            if wall is None:
+                plan_repo.finish_plan(plan.id, "FAILED", self.worker_id, error="Wall not found")
+                return True
+            obstacles = ObstacleRepository(db).get_obstacles_by_wall(plan.wall_id)
+            wall_data = {"id": wall.id, "geometry": wall.geometry}
+            obstacles_data = [{"geometry": o.geometry} for o in obstacles]
+
+            finished = threading.Event()
+            heartbeat = threading.Thread(target=self._heartbeat, args=(plan.id, finished), daemon=True)
+            heartbeat.start()
+            try:
+                PlannerService(db).run_plan(wall_data, obstacles_data, plan.resolution, plan_id=plan.id,
+                                            lease_owner=self.worker_id, **(plan.options or {}))
+            except Exception as e:
+                # run_plan already marked the plan FAILED
+                logger.error(f"PlanWorker {self.worker_id}: Plan {plan.id} failed: {e}")
+            finally:
+                finished.set()
+                heartbeat.join()
+            return True
+
+    def _heartbeat(self, plan_id, done):
+        # Renew three times per lease period, in a session of its own
+        with get_db_context() as db:
+            plan_repo = PlanRepository(db)
+            while not done.wait(self.lease_seconds / 3):
+                if not plan_repo.renew_lease(plan_id, self.worker_id, self.lease_seconds):
+                    logger.warning(f"PlanWorker {self.worker_id}: Lost lease on plan {plan_id}")
+                    return
+
+    def stop(self, *_):
+        """Finish the running plan, then stop."""
+        self.stopping.set()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Planner worker for the database plan queue")
+    parser.add_argument('--id', help='Worker id recorded as lease owner (default: host-pid-random)')
+    parser.add_argument('--once', action='store_true', help='Exit when no plan is left to claim')
+    args = parser.parse_args()
+
+    worker = PlanWorker(args.id)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run(once=args.once)
@@ -0,0 +1,34 @@
+"""Shared test setup: import paths, a scratch database and a fresh schema per test."""
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROBOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVER_DIR = os.path.join(ROBOT_DIR, "server")
+
+for path in (ROBOT_DIR, SERVER_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+# Server modules read DATABASE_URL when first imported, so it must point at a
+# scratch database before any test imports them; worker processes inherit it
+DATABASE_PATH = os.path.join(tempfile.mkdtemp(prefix="robot-tests-"), "planner.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DATABASE_PATH}"
+
+
+@pytest.fixture
+def db():
+    """Session on an empty database with the current schema."""
+    import database
+    import db_models  # noqa: F401  (registers the tables)
+
+    database.engine.echo = False
+    database.Base.metadata.drop_all(database.engine)
+    database.Base.metadata.create_all(database.engine)
+    session = database.SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
@@ -0,0 +1,88 @@
+"""Connector path cache: LRU eviction within its byte budget, keyed by grid fingerprint."""
+import numpy as np
+
+from algorithm.algorithms import CachedSearch, ConnectorCache, GridSearch, grid_fingerprint
+from algorithm.path import as_path
+
+PATH = as_path([(0, 0), (0, 1), (0, 2), (1, 2)])
+ENTRY_SIZE = ConnectorCache.ENTRY_OVERHEAD + PATH.nbytes
+
+
+def test_hits_and_misses_are_counted():
+    cache = ConnectorCache()
+
+    assert cache.get("grid", (0, 0), (1, 2)) is None
+    cache.put("grid", (0, 0), (1, 2), PATH)
+    assert np.array_equal(cache.get("grid", (0, 0), (1, 2)), PATH)
+    # Each direction is an entry of its own
+    assert cache.get("grid", (1, 2), (0, 0)) is None
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 2)
+    assert stats["hit_rate"] == round(1 / 3, 3)
+    assert cache.lookups() == (1, 2)
+
+
+def test_cached_paths_are_read_only_copies():
+    cache = ConnectorCache()
+    path = PATH.copy()
+    cache.put("grid", (0, 0), (1, 2), path)
+    path[0] = (9, 9)
+
+    cached = cache.get("grid", (0, 0), (1, 2))
+    assert np.array_equal(cached, PATH)
+    assert not cached.flags.writeable
+
+
+def test_least_recently_used_entries_are_evicted_first():
+    cache = ConnectorCache(max_bytes=3 * ENTRY_SIZE)
+    for goal in range(3):
+        cache.put("grid", (0, 0), (goal, 5), PATH)
+    # Using the oldest entry makes the second one least recently used
+    assert cache.get("grid", (0, 0), (0, 5)) is not None
+
+    cache.put("grid", (0, 0), (3, 5), PATH)
+
+    assert cache.get("grid", (0, 0), (1, 5)) is None
+    for goal in (0, 2, 3):
+        assert cache.get("grid", (0, 0), (goal, 5)) is not None
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["entries"] == 3
+    assert stats["bytes"] == 3 * ENTRY_SIZE <= stats["max_bytes"]
+
+
+def test_capacity_is_never_exceeded():
+    cache = ConnectorCache(max_bytes=5 * ENTRY_SIZE + ENTRY_SIZE // 2)
+    for goal in range(20):
+        cache.put("grid", (0, 0), (goal, 0), PATH)
+        assert cache.current_bytes <= cache.max_bytes
+    assert cache.stats()["entries"] == 5
+
+    # Entries larger than the whole budget are not stored
+    cache.put("grid", (1, 1), (2, 2), as_path(np.zeros((10 * ENTRY_SIZE, 2))))
+    assert cache.get("grid", (1, 1), (2, 2)) is None
+
+    cache.resize(2 * ENTRY_SIZE)
+    assert cache.stats()["entries"] == 2
+    assert cache.get("grid", (0, 0), (19, 0)) is not None
+
+
+def test_changed_grid_misses_the_cached_connectors():
+    grid = np.zeros((6, 8), dtype=np.uint8)
+    cache = ConnectorCache()
+    search = CachedSearch(GridSearch(grid), cache, grid_fingerprint(grid))
+    open_path = search.search((0, 0), (0, 7))
+    assert np.array_equal(search.search((0, 0), (0, 7)), open_path)
+    assert cache.lookups() == (1, 1)
+
+    # A wall now blocks the cached route; the new grid has another fingerprint
+    walled = grid.copy()
+    walled[:5, 3] = 1
+    assert grid_fingerprint(walled) != grid_fingerprint(grid)
+    assert grid_fingerprint(grid.copy()) == grid_fingerprint(grid)
+    rerouted = CachedSearch(GridSearch(walled), cache, grid_fingerprint(walled)).search((0, 0), (0, 7))
+
+    assert cache.lookups() == (1, 2)
+    assert not walled[rerouted[:, 0], rerouted[:, 1]].any()
+    assert len(rerouted) > len(open_path)
@@ -0,0 +1,62 @@
+"""Connector search engines must find shortest paths exactly like the baseline A*."""
+import numpy as np
+import pytest
+
+from algorithm.algorithms import Algorithms, GridSearch, JumpPointSearch
+
+ENGINES = [GridSearch, JumpPointSearch]
+
+
+def random_grid(seed, shape=(24, 31), density=0.3):
+    rng = np.random.default_rng(seed)
+    return (rng.random(shape) < density).astype(np.uint8)
+
+
+def walled_grid():
+    """Two free regions split by a full-height wall, with a pocket in the left one."""
+    grid = np.zeros((12, 15), dtype=np.uint8)
+    grid[:, 7] = 1
+    grid[3:6, 1:4] = 1
+    grid[4, 2] = 0  # Free cell enclosed by the pocket
+    return grid
+
+
+def assert_valid_path(path, grid, start, goal):
+    assert tuple(path[0]) == start and tuple(path[-1]) == goal
+    assert not grid[path[:, 0], path[:, 1]].any()
+    assert (np.abs(np.diff(path, axis=0)).sum(axis=1) == 1).all()
+
+
+@pytest.mark.parametrize("engine", ENGINES, ids=lambda e: e.__name__)
+@pytest.mark.parametrize("seed", range(4))
+def test_path_lengths_match_baseline_astar(engine, seed):
+    grid = random_grid(seed)
+    free = [tuple(map(int, cell)) for cell in np.argwhere(grid == 0)]
+    rng = np.random.default_rng(100 + seed)
+    search = engine(grid)
+    baseline = Algorithms()
+
+    for _ in range(40):
+        start, goal = (free[i] for i in rng.choice(len(free), 2, replace=False))
+        expected = baseline.astar(grid, start, goal)
+        path = search.search(start, goal)
+        assert len(path) == len(expected), f"{start} -> {goal}"
+        if len(path):
+            assert_valid_path(path, grid, start, goal)
+
+
+@pytest.mark.parametrize("engine", ENGINES, ids=lambda e: e.__name__)
+def test_unreachable_goals_return_empty_paths(engine):
+    grid = walled_grid()
+    search = engine(grid)
+
+    for start, goal in [((0, 0), (11, 14)), ((0, 0), (4, 2)), ((4, 2), (11, 0))]:
+        assert Algorithms().astar(grid, start, goal) == []
+        path = search.search(start, goal)
+        assert path.shape == (0, 2)
+    assert search.unreachable == 3
+
+    # Engines keep working after failed searches
+    path = search.search((0, 0), (11, 6))
+    assert len(path) == len(Algorithms().astar(grid, (0, 0), (11, 6)))
+    assert_valid_path(path, grid, (0, 0), (11, 6))
@@ -0,0 +1,65 @@
+"""The scanline and vectorized grid backends must agree cell for cell."""
+import numpy as np
+import pytest
+from shapely.geometry import Polygon, box
+
+from algorithm.grid_construction import Grid
+
+CONCAVE = Polygon([(0, 0), (8, 0), (8, 6), (5, 6), (5, 2.5), (3, 2.5), (3, 6), (0, 6)])
+HOLED = Polygon(
+    [(0, 0), (10, 0), (10, 7), (0, 7)],
+    [[(2, 2), (4, 2), (4, 5), (2, 5)], [(6, 1.5), (8.5, 3), (6.5, 5.5)]]
+)
+DIAGONAL = Polygon([(0, 1), (4, 0), (9, 3.3), (6, 8), (1, 6.1)])
+
+OBSTACLES = [
+    box(1, 1, 2, 2),
+    Polygon([(5.5, 3.5), (7, 4), (6.2, 5.2)]),
+    box(7.5, -1, 9, 1.2),  # Crosses the wall boundary
+]
+
+CASES = {
+    "concave": (CONCAVE, []),
+    "holed": (HOLED, []),
+    "diagonal": (DIAGONAL, []),
+    "concave_obstacles": (CONCAVE, OBSTACLES),
+    "holed_obstacles": (HOLED, OBSTACLES),
+    "diagonal_obstacles": (DIAGONAL, OBSTACLES),
+}
+
+
+@pytest.mark.parametrize("resolution", [0.1, 0.05, 0.137])
+@pytest.mark.parametrize("case", sorted(CASES))
+def test_scanline_matches_vectorized(case, resolution):
+    wall, obstacles = CASES[case]
+    grid = Grid()
+
+    vectorized = grid.build_grid(wall, obstacles, resolution, backend="vectorized")
+    scanline = grid.build_grid(wall, obstacles, resolution, backend="scanline")
+
+    assert scanline.shape == vectorized.shape
+    assert scanline.dtype == vectorized.dtype
+    mismatched = np.argwhere(scanline != vectorized)
+    assert not len(mismatched), f"{len(mismatched)} cells differ, first at {mismatched[:5].tolist()}"
+
+
+@pytest.mark.parametrize("case", sorted(CASES))
+def test_backends_match_pointwise_reference(case):
+    wall, obstacles = CASES[case]
+    grid = Grid()
+
+    reference = grid.build_grid(wall, obstacles, 0.25, backend="pointwise")
+    for backend in ("vectorized", "scanline"):
+        assert np.array_equal(grid.build_grid(wall, obstacles, 0.25, backend=backend), reference), backend
+
+
+def test_holes_and_obstacles_are_blocked():
+    grid = Grid().build_grid(HOLED, OBSTACLES, 0.1, backend="scanline")
+    xs, ys = Grid.cell_coordinates(HOLED.bounds, 0.1)
+
+    def cell(x, y):
+        return grid[np.searchsorted(ys, y), np.searchsorted(xs, x)]
+
+    assert cell(0.55, 0.55) == 0   # Free floor
+    assert cell(3.05, 3.55) == 1   # Inside a hole
+    assert cell(1.55, 1.55) == 1   # Inside an obstacle
@@ -0,0 +1,87 @@
+"""Tiled construction and patching must reproduce a full single-process build exactly."""
+import numpy as np
+import pytest
+from shapely.geometry import Polygon, box
+
+from algorithm.grid_construction import Grid
+
+CONCAVE = Polygon([(0, 0), (8, 0), (8, 6), (5, 6), (5, 2.5), (3, 2.5), (3, 6), (0, 6)])
+HOLED = Polygon(
+    [(0, 0), (10, 0), (10, 7), (0, 7)],
+    [[(2, 2), (4, 2), (4, 5), (2, 5)], [(6, 1.5), (8.5, 3), (6.5, 5.5)]]
+)
+
+OBSTACLES = [
+    box(1, 1, 2, 2),
+    Polygon([(5.5, 3.5), (7, 4), (6.2, 5.2)]),
+    box(7.5, -1, 9, 1.2),  # Crosses the wall boundary
+]
+
+WALLS = {"concave": CONCAVE, "holed": HOLED}
+
+
+def tiled_builder():
+    builder = Grid()
+    builder.TILED_MIN_CELLS = 0
+    return builder
+
+
+@pytest.mark.parametrize("shared", [False, True], ids=["copied", "shared"])
+@pytest.mark.parametrize("workers", [2, 3])
+@pytest.mark.parametrize("backend", ["vectorized", "scanline"])
+@pytest.mark.parametrize("wall", sorted(WALLS))
+def test_tiled_build_matches_single_process(wall, backend, workers, shared):
+    reference = Grid().build_grid(WALLS[wall], OBSTACLES, 0.1, backend=backend)
+
+    tiled = tiled_builder().build_grid(WALLS[wall], OBSTACLES, 0.1, backend=backend, workers=workers, shared=shared)
+
+    assert tiled.shape == reference.shape
+    assert tiled.dtype == reference.dtype
+    mismatched = np.argwhere(tiled != reference)
+    assert not len(mismatched), f"{len(mismatched)} cells differ, first at {mismatched[:5].tolist()}"
+
+
+# Off the resolution lattice, overlapping another obstacle, and crossing the wall boundary
+CHANGED = [box(4.23, 0.57, 5.81, 1.94), Polygon([(1.5, 1.5), (2.6, 1.2), (2.2, 2.7)]), box(-0.5, 3.1, 0.77, 3.9)]
+
+
+def assert_same_grid(patched, rebuilt):
+    mismatched = np.argwhere(patched != rebuilt)
+    assert not len(mismatched), f"{len(mismatched)} cells differ, first at {mismatched[:5].tolist()}"
+
+
+@pytest.mark.parametrize("changed", range(len(CHANGED)))
+@pytest.mark.parametrize("backend", ["vectorized", "scanline"])
+@pytest.mark.parametrize("wall", sorted(WALLS))
+def test_patch_after_adding_an_obstacle_matches_rebuild(wall, backend, changed):
+    builder = Grid()
+    obstacle = CHANGED[changed]
+    grid = builder.build_grid(WALLS[wall], OBSTACLES, 0.1, backend=backend)
+
+    patched = builder.patch_grid(grid, WALLS[wall], OBSTACLES + [obstacle], 0.1, obstacle.bounds, backend)
+
+    assert patched is grid
+    assert_same_grid(patched, builder.build_grid(WALLS[wall], OBSTACLES + [obstacle], 0.1, backend=backend))
+
+
+@pytest.mark.parametrize("changed", range(len(CHANGED)))
+@pytest.mark.parametrize("backend", ["vectorized", "scanline"])
+@pytest.mark.parametrize("wall", sorted(WALLS))
+def test_patch_after_removing_an_obstacle_matches_rebuild(wall, backend, changed):
+    builder = Grid()
+    obstacle = CHANGED[changed]
+    grid = builder.build_grid(WALLS[wall], OBSTACLES + [obstacle], 0.1, backend=backend)
+
+    patched = builder.patch_grid(grid, WALLS[wall], OBSTACLES, 0.1, obstacle.bounds, backend)
+
+    assert_same_grid(patched, builder.build_grid(WALLS[wall], OBSTACLES, 0.1, backend=backend))
+
+
+def test_patch_outside_the_grid_changes_nothing():
+    builder = Grid()
+    grid = builder.build_grid(CONCAVE, OBSTACLES, 0.1)
+    before = grid.copy()
+
+    builder.patch_grid(grid, CONCAVE, OBSTACLES + [box(20, 20, 21, 21)], 0.1, (20, 20, 21, 21))
+
+    assert np.array_equal(grid, before)
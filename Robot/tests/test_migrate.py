@@ -0,0 +1,27 @@
+"""Schema upgrades of databases written by older versions."""
+from database import engine
+from db_models import Grid
+from migrate import _pack_legacy_grids
+from repositories import GridRepository, WallRepository
+
+
+def test_legacy_grids_are_packed_and_empty_ones_cleared(db):
+    wall = WallRepository(db).create_wall("legacy", [[0, 0], [1, 0], [1, 1], [0, 1]])
+    grids = {
+        "packed": [[0, 1, 1], [1, 0, 0]],
+        "empty": [],
+        "ragged": [[0, 1], [1]]
+    }
+    for grid_id, grid_data in grids.items():
+        db.add(Grid(id=grid_id, wall_id=wall.id, resolution=0.1, grid_data=grid_data))
+    db.commit()
+
+    with engine.begin() as conn:
+        _pack_legacy_grids(conn)
+
+    db.expire_all()
+    packed = db.get(Grid, "packed")
+    assert GridRepository.load_grid_data(packed).tolist() == grids["packed"]
+    for grid_id in ("empty", "ragged"):
+        cleared = db.get(Grid, grid_id)
+        assert not GridRepository.has_grid_data(cleared)
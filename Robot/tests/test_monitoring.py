@@ -0,0 +1,37 @@
+"""/stats counters gathered from the processes that plan."""
+import numpy as np
+from fastapi.testclient import TestClient
+
+from algorithm import planner
+from main import app
+from repositories import WallRepository
+from services.planner_service import PlannerService
+
+WALL = [[0, 0], [4, 0], [4, 3], [0, 3]]
+OBSTACLE = [[1, 1], [2, 1], [2, 2], [1, 2]]
+
+
+def test_stats_sum_connector_lookups_of_every_plan(db):
+    wall = WallRepository(db).create_wall("stats", WALL)
+    service = PlannerService(db)
+    summaries = [service.run_plan({"id": wall.id, "geometry": WALL}, [{"geometry": OBSTACLE}], 0.1)
+                 for _ in range(2)]
+    # The second plan's connectors were cached by the first
+    assert summaries[1]["connector_cache"]["hits"] > 0
+
+    stats = TestClient(app).get("/stats").json()["connector_cache"]
+
+    assert stats["hits"] == sum(s["connector_cache"]["hits"] for s in summaries)
+    assert stats["misses"] == sum(s["connector_cache"]["misses"] for s in summaries)
+    assert stats["misses"] > 0
+
+
+def test_strategy_worker_lookups_are_counted_in_the_planning_process():
+    grid = np.zeros((30, 40), dtype=np.uint8)
+    grid[10:20, 15:25] = 1
+    hits, misses = planner.connector_cache.lookups()
+
+    planner.plan(grid, workers=2)
+
+    after = planner.connector_cache.lookups()
+    assert after[0] + after[1] > hits + misses
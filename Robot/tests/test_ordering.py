@@ -0,0 +1,55 @@
+"""Segment ordering optimizer: a reordering that never lengthens the gaps."""
+import numpy as np
+import pytest
+
+from algorithm.ordering import optimize_order, order_cost
+from algorithm.sweep import Segment
+
+
+def random_segments(seed, count=40):
+    """Horizontal segments scattered over a 60x80 grid, in a poor travel order."""
+    rng = np.random.default_rng(seed)
+    segments = []
+    for _ in range(count):
+        line = int(rng.integers(0, 60))
+        start, end = sorted(rng.choice(80, 2, replace=False).tolist())
+        direction = 1 if rng.random() < 0.5 else -1
+        if direction < 0:
+            start, end = end, start
+        segments.append(Segment(line, start, end, direction))
+    return segments
+
+
+def canonical(segment):
+    """The segment whatever its travel direction."""
+    return segment if segment.direction > 0 else segment.reversed()
+
+
+@pytest.mark.parametrize("iterations", [1, 10, 100, 1000])
+@pytest.mark.parametrize("seed", range(3))
+def test_result_is_a_permutation_never_longer_than_the_input(seed, iterations):
+    segments = random_segments(seed)
+
+    ordered = optimize_order(segments, iterations)
+
+    assert sorted(map(canonical, ordered)) == sorted(map(canonical, segments))
+    assert ordered[0] == segments[0]
+    assert order_cost(ordered) <= order_cost(segments)
+
+
+def test_iterations_improve_a_poor_order():
+    segments = random_segments(0)
+
+    assert order_cost(optimize_order(segments, 1000)) < order_cost(segments)
+
+
+def test_zero_iterations_keep_the_input_order():
+    segments = random_segments(1)
+
+    assert optimize_order(segments, 0) == segments
+
+
+def test_same_input_same_order():
+    segments = random_segments(2)
+
+    assert optimize_order(segments, 500) == optimize_order(segments, 500)
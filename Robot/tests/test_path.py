@@ -0,0 +1,49 @@
+"""Waypoint compression of path arrays must be lossless."""
+import numpy as np
+import pytest
+
+from algorithm.path import as_path, from_waypoints, line_cells, path_dtype, to_waypoints
+
+STAIRCASE = [(0, 0), (0, 1), (1, 1), (1, 2), (2, 2), (2, 3), (3, 3)]
+SWEEP_WITH_JUMP = [(0, 0), (0, 1), (0, 2), (0, 3), (1, 3), (1, 2), (1, 1),  # Serpentine rows
+                   (5, 7), (5, 8), (6, 8), (7, 8), (7, 9),                 # After a jump between regions
+                   (2, 2)]                                                 # A lone cell after another jump
+BACKTRACK = [(3, 3), (3, 4), (3, 5), (3, 4), (3, 3), (4, 3), (4, 3)]      # Reversal and a repeated cell
+
+
+@pytest.mark.parametrize("cells", [STAIRCASE, SWEEP_WITH_JUMP, BACKTRACK, [(4, 4)], []],
+                         ids=["staircase", "jumps", "backtrack", "single", "empty"])
+def test_round_trip_restores_every_cell(cells):
+    path = as_path(cells, (10, 10))
+
+    restored = from_waypoints(to_waypoints(path), (10, 10))
+
+    assert np.array_equal(restored, path)
+    assert restored.dtype == path.dtype
+
+
+def test_straight_runs_keep_only_their_turn_points():
+    polylines = to_waypoints(as_path(SWEEP_WITH_JUMP))
+
+    assert polylines == [
+        [[0, 0], [0, 3], [1, 3], [1, 1]],
+        [[5, 7], [5, 8], [7, 8], [7, 9]],
+        [[2, 2]]
+    ]
+    # Diagonal staircases have no straight runs to drop
+    assert len(to_waypoints(as_path(STAIRCASE))[0]) == len(STAIRCASE)
+
+
+@pytest.mark.parametrize("shape, dtype", [((100, 200), np.int16), ((10, 32767), np.int16),
+                                          ((32768, 10), np.int32), ((40000, 40000), np.int32)])
+def test_dtype_follows_grid_shape(shape, dtype):
+    # A straight run out to the far edge, then down a row
+    far = max(shape) - 1
+    path = as_path(np.concatenate([line_cells(0, 0, far), [(1, far)]]), shape)
+
+    assert path_dtype(shape) == dtype
+    assert path.dtype == dtype
+    assert to_waypoints(path) == [[[0, 0], [0, far], [1, far]]]
+    restored = from_waypoints(to_waypoints(path), shape)
+    assert restored.dtype == dtype
+    assert np.array_equal(restored, path)
@@ -0,0 +1,98 @@
+"""Plan result cache: keys shared by identical walls, entries owning the bytes they count."""
+import numpy as np
+from fastapi.testclient import TestClient
+from shapely.geometry import Polygon
+
+from algorithm.grid_construction import Grid as GridBuilder
+from main import app
+from repositories import PathRepository, PlanCacheRepository, PlanRepository, WallRepository
+from services.planner_service import PlannerService
+
+OPTIONS = {"connector": "astar", "sweep_angles": [], "deadline_ms": None, "coarse_resolution": None}
+RESOLUTION = 0.1
+
+
+def rectangle(x, y, width=3.2, height=2.4):
+    return [[x, y], [x + width, y], [x + width, y + height], [x, y + height]]
+
+
+def wall_data(db, name, geometry):
+    wall = WallRepository(db).create_wall(name, geometry)
+    return {"id": wall.id, "geometry": wall.geometry}
+
+
+def translated(geometry, dx, dy):
+    return [[x + dx, y + dy] for x, y in geometry]
+
+
+def test_only_walls_at_the_same_coordinates_share_plans(db):
+    service = PlannerService(db)
+    wall = rectangle(0, 0, width=6, height=3)
+    obstacles = [rectangle(1.0, 0.5, 0.8, 0.6), rectangle(3.5, 1.4, 1.1, 0.7)]
+    original = wall_data(db, "original", wall)
+    service.run_plan(original, [{"geometry": g} for g in obstacles], RESOLUTION, **OPTIONS)
+
+    # A copy on another storey keeps its coordinates, whatever the obstacle order
+    storey = wall_data(db, "storey", wall)
+    assert service.cached_plan(storey, [{"geometry": g} for g in reversed(obstacles)], RESOLUTION, OPTIONS)
+
+    # Cells are sampled at absolute positions, so moved elsewhere the obstacle
+    # edges lying on sample points round differently and the plan must not be reused
+    dx, dy = 100.1, 45.6
+    wall_polygon = Polygon(wall)
+    grid = GridBuilder().build_grid(wall_polygon, [Polygon(g) for g in obstacles], RESOLUTION)
+    moved_grid = GridBuilder().build_grid(Polygon(translated(wall, dx, dy)),
+                                          [Polygon(translated(g, dx, dy)) for g in obstacles], RESOLUTION)
+    assert not np.array_equal(grid, moved_grid)
+    moved = wall_data(db, "moved", translated(wall, dx, dy))
+    assert service.cached_plan(moved, [{"geometry": translated(g, dx, dy)} for g in obstacles],
+                               RESOLUTION, OPTIONS) is None
+
+
+def test_cache_hits_are_cloned_from_the_entry(db):
+    service = PlannerService(db)
+    original = wall_data(db, "original", rectangle(0, 0))
+    summary = service.run_plan(original, [], RESOLUTION, **OPTIONS)
+    source_paths = {p.strategy: p.waypoints for p in PathRepository(db).get_paths_by_plan(summary["plan_id"])}
+
+    # Later changes to the source plan's rows do not reach the cache
+    for path in PathRepository(db).get_paths_by_plan(summary["plan_id"]):
+        path.waypoints = []
+    db.commit()
+
+    copy = wall_data(db, "copy", rectangle(0, 0))
+    cached = service.cached_plan(copy, [], RESOLUTION, OPTIONS)
+    clones = PathRepository(db).get_paths_by_plan(cached.id)
+    assert {p.strategy: p.waypoints for p in clones} == source_paths
+    assert {c["path_id"] for c in cached.summary["candidates"]} == {p.id for p in clones}
+    assert cached.best_path_id in {p.id for p in clones}
+
+
+def test_eviction_keeps_the_stored_payloads_within_budget(db):
+    wall = WallRepository(db).create_wall("evict", rectangle(0, 0))
+    plan_repo = PlanRepository(db)
+    cache_repo = PlanCacheRepository(db)
+    payloads = [PlanCacheRepository.encode_plan({"candidates": [], "n": i}, None, []) for i in range(3)]
+    budget = len(payloads[0]) + len(payloads[1])
+
+    for i, payload in enumerate(payloads):
+        plan = plan_repo.create_plan(wall.id, RESOLUTION)
+        cache_repo.put_entry(f"key-{i}", plan.id, payload, budget)
+
+    stats = cache_repo.stats()
+    assert stats["bytes"] <= budget
+    assert stats["entries"] == 2
+    assert cache_repo.get_entry("key-0") is None
+    assert PlanCacheRepository.decode_plan(cache_repo.get_entry("key-2").payload)["summary"]["n"] == 2
+
+
+def test_api_serves_cache_hits(db):
+    service = PlannerService(db)
+    service.run_plan(wall_data(db, "original", rectangle(0, 0)), [], RESOLUTION, **OPTIONS)
+    copy = wall_data(db, "copy", rectangle(0, 0))
+
+    response = TestClient(app).post(f"/walls/{copy['id']}/plan", json={"resolution": RESOLUTION})
+
+    assert response.status_code == 202, response.text
+    assert response.json()["cached"]
+    assert response.json()["status"] == "COMPLETED"
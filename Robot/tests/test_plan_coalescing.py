@@ -0,0 +1,137 @@
+"""Single-flight plan requests: one in-flight plan per request key, orphans replaced."""
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import IntegrityError
+
+from api import planning
+from main import app
+from repositories import PlanRepository, WallRepository
+from services.plan_jobs import plan_jobs
+from services.planner_service import PlannerService
+
+WALL = [[0, 0], [4, 0], [4, 3], [0, 3]]
+REQUEST = {"resolution": 0.25}
+
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+
+@pytest.fixture
+def database_queue(monkeypatch):
+    monkeypatch.setattr(planning, "PLAN_QUEUE", "database")
+
+
+def post_plan(client, wall_id):
+    response = client.post(f"/walls/{wall_id}/plan", json=REQUEST)
+    assert response.status_code == 202, response.text
+    return response.json()
+
+
+def reload(db, plan_id):
+    db.expire_all()
+    return PlanRepository(db).get_plan(plan_id)
+
+
+def test_second_in_flight_plan_of_a_key_is_rejected(db):
+    wall = WallRepository(db).create_wall("unique", WALL)
+    plan_repo = PlanRepository(db)
+    first = plan_repo.create_plan(wall.id, 0.25, request_key="key")
+
+    with pytest.raises(IntegrityError):
+        plan_repo.create_plan(wall.id, 0.25, request_key="key")
+    db.rollback()
+
+    # Finished plans no longer hold the key
+    plan_repo.update_plan_status(first.id, "FAILED", error="test")
+    assert plan_repo.create_plan(wall.id, 0.25, request_key="key").status == "PENDING"
+
+
+def test_identical_requests_join_the_queued_plan(db, client, database_queue):
+    wall = WallRepository(db).create_wall("join", WALL)
+    first = post_plan(client, wall.id)
+    second = post_plan(client, wall.id)
+
+    assert second["plan_id"] == first["plan_id"]
+    assert second["coalesced"]
+
+
+def test_request_losing_the_insert_race_joins_the_winner(db, client, database_queue, monkeypatch):
+    wall = WallRepository(db).create_wall("race", WALL)
+    first = post_plan(client, wall.id)
+
+    # As if another process inserted its plan between this request's lookup and insert
+    lookup = PlanRepository.get_in_flight_plan
+    calls = []
+
+    def racing_lookup(self, request_key):
+        calls.append(request_key)
+        return None if len(calls) == 1 else lookup(self, request_key)
+
+    monkeypatch.setattr(PlanRepository, "get_in_flight_plan", racing_lookup)
+    second = post_plan(client, wall.id)
+
+    assert len(calls) == 2
+    assert second["plan_id"] == first["plan_id"]
+    assert second["coalesced"]
+
+
+def test_plan_with_expired_lease_is_replaced(db, client, database_queue):
+    wall = WallRepository(db).create_wall("expired", WALL)
+    first = post_plan(client, wall.id)
+    # A worker claimed the plan and died without renewing its lease
+    assert PlanRepository(db).claim_plan("dead-worker", lease_seconds=-1).id == first["plan_id"]
+
+    second = post_plan(client, wall.id)
+
+    assert second["plan_id"] != first["plan_id"]
+    assert not second["coalesced"]
+    orphan = reload(db, first["plan_id"])
+    assert orphan.status == "FAILED"
+    assert orphan.error.startswith("Orphaned")
+
+
+def test_local_plan_not_held_by_the_queue_is_replaced(db, client, monkeypatch):
+    wall = WallRepository(db).create_wall("orphan", WALL)
+    monkeypatch.setattr(planning, "PLAN_QUEUE", "database")
+    orphan_id = post_plan(client, wall.id)["plan_id"]
+    monkeypatch.setattr(planning, "PLAN_QUEUE", "local")
+    submitted = []
+    monkeypatch.setattr(plan_jobs, "submit", lambda plan_id, *args, **kwargs: submitted.append(plan_id))
+
+    # A plan left PENDING by a previous server process is not joined
+    replacement = post_plan(client, wall.id)
+
+    assert replacement["plan_id"] != orphan_id
+    assert submitted == [replacement["plan_id"]]
+    assert reload(db, orphan_id).status == "FAILED"
+
+
+def test_startup_fails_plans_left_by_a_previous_server(db):
+    wall = WallRepository(db).create_wall("restart", WALL)
+    plan_repo = PlanRepository(db)
+    leased = plan_repo.create_plan(wall.id, 0.5, request_key="other")
+    plan_repo.claim_plan("queue-worker", lease_seconds=60)
+    orphan = plan_repo.create_plan(wall.id, 0.25, request_key="key")
+
+    with TestClient(app):
+        pass
+
+    assert reload(db, orphan.id).status == "FAILED"
+    # Database queue plans belong to their workers
+    assert reload(db, leased.id).status == "RUNNING"
+
+
+def test_job_does_not_revive_a_plan_failed_as_orphan(db):
+    wall = WallRepository(db).create_wall("revive", WALL)
+    plan_repo = PlanRepository(db)
+    plan = plan_repo.create_plan(wall.id, 0.25, request_key="key")
+    plan_repo.fail_orphaned_plans("Orphaned: test", plan.id)
+
+    summary = PlannerService(db).run_plan({"id": wall.id, "geometry": WALL}, [], 0.25, plan_id=plan.id)
+
+    assert summary is None
+    plan = reload(db, plan.id)
+    assert plan.status == "FAILED"
+    assert not plan.paths
@@ -0,0 +1,143 @@
+"""Database plan queue: claiming, lease expiry, fencing and exhausted plans."""
+import os
+import signal
+import subprocess
+import sys
+import time
+
+import pytest
+
+from conftest import SERVER_DIR
+from db_models import Plan
+from repositories import PathRepository, PlanRepository, WallRepository
+from services.planner_service import PlannerService
+from worker import PlanWorker
+
+OPTIONS = {"connector": "astar", "sweep_angles": [], "deadline_ms": None, "coarse_resolution": None}
+SMALL_WALL = [[0, 0], [6, 0], [6, 4], [0, 4]]
+LARGE_WALL = [[0, 0], [20, 0], [20, 5], [0, 5]]
+
+
+def spawn_worker(worker_id, config_path=None, once=True):
+    env = dict(os.environ)
+    if config_path is not None:
+        env["ROBOT_CONFIG"] = str(config_path)
+    args = [sys.executable, "worker.py", "--id", worker_id] + (["--once"] if once else [])
+    return subprocess.Popen(args, cwd=SERVER_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def reload(db, plan_id):
+    db.expire_all()
+    return PlanRepository(db).get_plan(plan_id)
+
+
+def test_racing_workers_claim_each_plan_once(db):
+    wall = WallRepository(db).create_wall("racing", SMALL_WALL)
+    plan_repo = PlanRepository(db)
+    plan_ids = [plan_repo.create_plan(wall.id, resolution, OPTIONS).id
+                for resolution in (0.05, 0.1, 0.2, 0.25) * 2]
+
+    workers = [spawn_worker(f"racer-{i}") for i in range(3)]
+    for worker in workers:
+        assert worker.wait(timeout=300) == 0
+
+    owners = set()
+    for plan_id in plan_ids:
+        plan = reload(db, plan_id)
+        assert plan.status == "COMPLETED"
+        assert plan.attempts == 1
+        owners.add(plan.lease_owner)
+        # One set of candidate paths: no second worker ran the plan
+        paths = PathRepository(db).get_paths_by_plan(plan_id)
+        assert len(paths) == len(plan.summary["candidates"])
+    assert owners <= {f"racer-{i}" for i in range(3)}
+
+
+def test_expired_lease_is_reclaimed_after_worker_dies(db, tmp_path):
+    config_path = tmp_path / "config.ini"
+    config_path.write_text("[planning]\nplan_lease_seconds = 1\nplan_poll_seconds = 0.1\n")
+    wall = WallRepository(db).create_wall("crash", LARGE_WALL)
+    plan_id = PlanRepository(db).create_plan(wall.id, 0.025, OPTIONS).id
+
+    worker = spawn_worker("doomed", config_path, once=False)
+    try:
+        deadline = time.monotonic() + 60
+        while reload(db, plan_id).status != "RUNNING":
+            assert time.monotonic() < deadline, "worker never claimed the plan"
+            time.sleep(0.05)
+    finally:
+        worker.send_signal(signal.SIGKILL)
+        worker.wait()
+
+    plan = reload(db, plan_id)
+    assert (plan.status, plan.lease_owner, plan.attempts) == ("RUNNING", "doomed", 1)
+    # Nobody renews the lease any more
+    assert PlanRepository(db).claim_plan("early", 30) is None
+    time.sleep(1.2)
+
+    assert PlanWorker("rescuer", lease_seconds=30, max_attempts=3).run_next()
+    plan = reload(db, plan_id)
+    assert (plan.status, plan.lease_owner, plan.attempts) == ("COMPLETED", "rescuer", 2)
+    assert len(PathRepository(db).get_paths_by_plan(plan_id)) == len(plan.summary["candidates"])
+
+
+def test_plans_out_of_attempts_are_failed(db):
+    wall = WallRepository(db).create_wall("flaky", SMALL_WALL)
+    plan_repo = PlanRepository(db)
+    exhausted = plan_repo.create_plan(wall.id, 0.1, OPTIONS).id
+    for owner in ("a", "b", "c"):
+        # A negative lease expires at once, as if each worker died
+        assert plan_repo.claim_plan(owner, -1).id == exhausted
+    retried = plan_repo.create_plan(wall.id, 0.2, OPTIONS).id
+
+    assert plan_repo.fail_exhausted_plans(3) == 1
+    plan = reload(db, exhausted)
+    assert plan.status == "FAILED"
+    assert plan.error == "Lease expired after 3 attempts"
+    assert plan.completed_at is not None
+
+    # A plan with attempts left is reclaimed and run by the next worker
+    assert plan_repo.claim_plan("d", -1).id == retried
+    assert plan_repo.fail_exhausted_plans(3) == 0
+    assert PlanWorker("e", lease_seconds=30, max_attempts=3).run_next()
+    plan = reload(db, retried)
+    assert (plan.status, plan.attempts) == ("COMPLETED", 2)
+    assert not PlanWorker("f", lease_seconds=30, max_attempts=3).run_next()
+
+
+def test_results_of_a_lost_lease_are_discarded(db):
+    wall = WallRepository(db).create_wall("fenced", SMALL_WALL)
+    plan_repo = PlanRepository(db)
+    plan_id = plan_repo.create_plan(wall.id, 0.1, OPTIONS).id
+    plan_repo.claim_plan("stale", -1)
+    plan_repo.claim_plan("current", 30)
+
+    result = PlannerService(db).run_plan({"id": wall.id, "geometry": SMALL_WALL}, [], 0.1,
+                                         plan_id=plan_id, lease_owner="stale")
+    assert result is None
+    plan = reload(db, plan_id)
+    assert (plan.status, plan.lease_owner) == ("RUNNING", "current")
+    assert PathRepository(db).get_paths_by_plan(plan_id) == []
+
+    assert not plan_repo.finish_plan(plan_id, "FAILED", "stale", error="late failure")
+    assert plan_repo.finish_plan(plan_id, "FAILED", "current", error="failed")
+    assert reload(db, plan_id).status == "FAILED"
+
+
+def test_failure_after_takeover_leaves_plan_to_new_owner(db, monkeypatch):
+    wall = WallRepository(db).create_wall("broken", SMALL_WALL)
+    plan_repo = PlanRepository(db)
+    plan_id = plan_repo.create_plan(wall.id, 0.1, OPTIONS).id
+    plan_repo.claim_plan("stale", -1)
+    plan_repo.claim_plan("current", 30)
+
+    def fail(*args, **kwargs):
+        raise RuntimeError("planner crashed")
+
+    monkeypatch.setattr("services.planner_service.planner_module.plan", fail)
+    with pytest.raises(RuntimeError):
+        PlannerService(db).run_plan({"id": wall.id, "geometry": SMALL_WALL}, [], 0.1,
+                                    plan_id=plan_id, lease_owner="stale")
+    plan = reload(db, plan_id)
+    assert (plan.status, plan.lease_owner, plan.error) == ("RUNNING", "current", None)
+    assert db.query(Plan).count() == 1
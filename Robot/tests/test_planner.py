@@ -0,0 +1,52 @@
+"""Strategy evaluation: coarse-to-fine refinement and deadlines."""
+from shapely.geometry import Polygon
+
+from algorithm import planner
+from algorithm.grid_construction import Grid
+
+WALL = Polygon([[0, 0], [6, 0], [6, 3], [0, 3]])
+OBSTACLES = [Polygon([[1, 1], [2, 1], [2, 2], [1, 2]]), Polygon([[3.5, 0.5], [4.5, 0.5], [4.5, 2], [3.5, 2]])]
+
+
+def build(resolution):
+    return Grid().build_grid(WALL, OBSTACLES, resolution)
+
+
+def test_coarse_losers_report_estimates_not_bounds():
+    result = planner.plan(build(0.1), coarse_grid=build(0.5), coarse_scale=5)
+
+    assert result["candidates"] == [result["best"]]
+    assert result["pruned"]
+    for pruned in result["pruned"]:
+        assert pruned["reason"] == "coarse"
+        assert pruned["bound"] is None
+    assert any(p["estimated_length"] for p in result["pruned"])
+
+
+def test_zero_deadline_keeps_the_first_strategy_and_skips_the_rest():
+    grid = build(0.1)
+
+    result = planner.plan(grid, time_budget=0, sweep_angles=[30])
+
+    assert result["candidates"] == [result["best"]]
+    assert len(result["best"]["path"])
+    assert result["pruned"] == []
+    names = {result["best"]["strategy"], *result["skipped"]}
+    assert names == {*planner.STRATEGIES, planner.sweep_name(30)}
+    assert len(result["skipped"]) == len(names) - 1
+
+
+def test_strategies_past_their_deadline_are_abandoned():
+    grid = build(0.1)
+    search = planner.make_search(grid, "astar")
+
+    result = planner.evaluate_strategy(grid, "vertical", search, deadline=0)
+
+    assert result == {"strategy": "vertical", "reason": "deadline", "bound": None}
+
+
+def test_zero_deadline_refinement_still_returns_a_plan():
+    result = planner.plan(build(0.1), time_budget=0, coarse_grid=build(0.5), coarse_scale=5)
+
+    assert result["candidates"] == [result["best"]]
+    assert len(result["best"]["path"])
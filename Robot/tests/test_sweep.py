@@ -0,0 +1,121 @@
+"""Sweep strategies: segments inside free space that together cover all of it."""
+import numpy as np
+import pytest
+
+from algorithm.sweep import Sweep
+
+
+def obstacle_grid():
+    """Free space split and merged by obstacles, with a closed-off pocket."""
+    grid = np.zeros((20, 26), dtype=np.uint8)
+    grid[4:9, 5:9] = 1
+    grid[11:16, 14:22] = 1
+    grid[0:6, 17] = 1
+    grid[16:, 3] = 1
+    grid[2:5, 22:25] = 1
+    grid[3, 23] = 0  # Enclosed free cell
+    return grid
+
+
+def random_grid(seed):
+    rng = np.random.default_rng(seed)
+    return (rng.random((17, 23)) < 0.25).astype(np.uint8)
+
+
+GRIDS = {
+    "obstacles": obstacle_grid(),
+    "random": random_grid(0),
+    "empty": np.zeros((5, 7), dtype=np.uint8),
+    "blocked": np.ones((4, 4), dtype=np.uint8),
+}
+
+
+def coverage_counts(grid, paths):
+    counts = np.zeros(grid.shape, dtype=np.int64)
+    for path in paths:
+        np.add.at(counts, (path[:, 0], path[:, 1]), 1)
+    return counts
+
+
+def assert_inside_free_space(grid, path):
+    assert not grid[path[:, 0], path[:, 1]].any()
+
+
+@pytest.mark.parametrize("name", sorted(GRIDS))
+def test_free_runs_partition_the_free_cells(name):
+    grid = GRIDS[name]
+    lines, firsts, lasts = Sweep.free_runs(grid)
+
+    counts = np.zeros(grid.shape, dtype=np.int64)
+    for line, first, last in zip(lines, firsts, lasts):
+        assert first <= last
+        counts[line, first:last + 1] += 1
+    # Disjoint, inside free cells, and covering every one of them
+    assert np.array_equal(counts, grid == 0)
+
+
+@pytest.mark.parametrize("name", sorted(GRIDS))
+def test_boustrophedon_cells_partition_the_free_cells(name):
+    grid = GRIDS[name]
+    cells = Sweep(robot=None).boustrophedon(grid)
+
+    runs = np.zeros(grid.shape, dtype=np.int64)
+    for cell in cells:
+        for line, first, last in cell.runs:
+            runs[line, first:last + 1] += 1
+        # Runs of a cell are on consecutive lines
+        lines = [line for line, _, _ in cell.runs]
+        assert lines == list(range(lines[0], lines[0] + len(lines)))
+    assert np.array_equal(runs, grid == 0)
+
+    swept = [cell.cells() for cell in cells]
+    for cell, path in zip(cells, swept):
+        assert_inside_free_space(grid, path)
+        # The lawnmower pattern and its links need no connector search
+        assert (np.abs(np.diff(path, axis=0)).sum(axis=1) == 1).all()
+        assert len(path) == cell.length
+        assert tuple(path[0]) == cell.first and tuple(path[-1]) == cell.last
+    assert np.array_equal(coverage_counts(grid, swept) > 0, grid == 0)
+
+
+@pytest.mark.parametrize("name", sorted(GRIDS))
+def test_boustrophedon_reversed_cells_travel_backwards(name):
+    for cell in Sweep(robot=None).boustrophedon(GRIDS[name]):
+        backwards = cell.reversed()
+        assert np.array_equal(backwards.cells(), cell.cells()[::-1])
+        assert (backwards.first, backwards.last) == (cell.last, cell.first)
+
+
+def segment_paths(segments):
+    return [tuple(map(tuple, segment.cells().tolist())) for segment in segments]
+
+
+@pytest.mark.parametrize("name", sorted(GRIDS))
+def test_axis_angles_match_the_baseline_sweeps(name):
+    grid = GRIDS[name]
+    sweep = Sweep(robot=None)
+    angled = sweep.angle_sweeps(grid, [0, 90])
+
+    # 0 degrees is the horizontal serpentine, run for run and in order
+    assert segment_paths(angled[0.0]) == segment_paths(sweep.horizontal_sweep(grid))
+    # 90 degrees walks the columns the other way round, each run like the vertical sweep's
+    assert sorted(segment_paths(angled[90.0])) == sorted(segment_paths(sweep.vertical_sweep(grid)))
+
+
+@pytest.mark.parametrize("angle", [0, 15, 30, 45, 60, 90, 135, 170])
+@pytest.mark.parametrize("name", sorted(GRIDS))
+def test_angled_runs_cover_every_free_cell(name, angle):
+    grid = GRIDS[name]
+    runs = Sweep(robot=None).angle_sweeps(grid, [angle])[float(angle)]
+
+    paths = [run.cells() for run in runs]
+    for path in paths:
+        assert_inside_free_space(grid, path)
+        assert (np.abs(np.diff(path, axis=0)).sum(axis=1) == 1).all()
+    counts = coverage_counts(grid, paths)
+    assert np.array_equal(counts > 0, grid == 0)
+    # Runs are disjoint but for the corner cells joining diagonal steps of a band
+    corners = sum(int((np.abs(p[2:] - p[:-2]) == 1).all(axis=1).sum()) for p in paths)
+    assert counts.sum() - (grid == 0).sum() <= corners
+    if angle in (0, 90):
+        assert counts.max(initial=0) <= 1